@@ -18,21 +18,27 @@ Features:
 """
 
 import os
-import json
+import hashlib
+import uuid
 import time
 import logging
 import asyncio
 import aiohttp
 import aiofiles
-import concurrent.futures
+import orjson
 import argparse
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple, Union
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Any, Optional
 import re
 import random
 from dotenv import find_dotenv, load_dotenv
 
-load_dotenv(find_dotenv())
+# Load environment variables from .env. DOTENV_PATH points at the file directly
+# instead of searching parent directories, and COURSEGPT_SKIP_DOTENV=1 skips it
+# when the environment is injected by the deployment.
+if os.environ.get("COURSEGPT_SKIP_DOTENV") != "1":
+    load_dotenv(os.environ.get("DOTENV_PATH") or find_dotenv())
 
 # Configure logging
 logging.basicConfig(
@@ -50,70 +56,146 @@ PROMPTS_DIR = "prompts"
 OUTPUT_DIR = "output"
 MAX_RETRIES = 5
 RETRY_DELAY_BASE = 2  # Base delay in seconds for exponential backoff
-PARALLEL_REQUESTS = 3  # Number of parallel content generation requests
+PARALLEL_REQUESTS = 3  # Initial number of concurrent API requests
+MAX_PARALLEL_REQUESTS = 12  # Upper bound the request concurrency can grow to
+CONCURRENCY_INCREASE_INTERVAL = 30  # Seconds of successful requests before allowing one more in flight
+OVERLOAD_REACTION_WINDOW = 5  # Seconds after a decrease during which further overload signals are ignored
+REQUEST_TIMEOUT = 600  # Total seconds allowed for a single API request
+KEEPALIVE_TIMEOUT = 75  # Seconds idle connections to the API are kept open
+RATE_LIMIT_WINDOW = 60  # Seconds over which the API's rate limits replenish
+STREAM_FLUSH_CHARS = 4000  # Streamed content buffered before each write to disk
+MAX_PROGRESS_LOG_ENTRIES = 2000  # Most recent log entries kept in progress files
+PROGRESS_CHECKPOINT_INTERVAL = 5  # Completed subunits between mid-run progress checkpoints
+DESCRIPTION_TOKENS_PER_SUBUNIT = 450  # A 150-250 word enhanced description plus its JSON wrapping
+DESCRIPTION_TOKENS_OVERHEAD = 500  # Room for the array brackets and any text around the JSON
+DESCRIPTION_ENHANCEMENT_ATTEMPTS = 2  # Tries per unit before its subunits are given up on
 API_KEY_ENV_VAR = "PERPLEXITY_API_KEY"
 API_ENDPOINT = "https://api.perplexity.ai/chat/completions"
+CACHE_DIR = os.path.join(OUTPUT_DIR, ".cache")  # Disk cache for API responses
+CACHE_ENABLED_ENV_VAR = "COURSEGPT_CACHE_ENABLED"  # Set to "0" to disable the response cache
+CACHE_FORCE_REFRESH_ENV_VAR = "COURSEGPT_CACHE_FORCE_REFRESH"  # Set to "1" to bypass cached responses
+
+# Patterns used for every file name and API response, compiled once at import
+UNSAFE_FILENAME_CHARS_PATTERN = re.compile(r'[^\w\-\.]')
+REPEATED_UNDERSCORES_PATTERN = re.compile(r'__+')
+JSON_CODE_BLOCK_PATTERN = re.compile(r'```(?:json)?\s*([\s\S]*?)\s*```')
+COURSE_FOLDER_TIMESTAMP_PATTERN = re.compile(r'-(\d{8}-\d{6})$')
 
 # Rate limit tracking
+class TokenBucket:
+    """Continuously refilled token bucket used to pace API usage"""
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate  # Tokens added per second
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+    
+    def update(self, capacity: float, remaining: Optional[float] = None) -> None:
+        """Resize the bucket to a new limit and sync its level with the server's count"""
+        self._refill()
+        self.capacity = capacity
+        self.rate = capacity / RATE_LIMIT_WINDOW
+        if remaining is None:
+            self.tokens = min(self.tokens, capacity)
+        else:
+            # The server's count replaces the local one in both directions, which credits
+            # back whatever the upper-bound estimates passed to acquire() overcharged
+            self.tokens = min(remaining, capacity)
+    
+    async def acquire(self, cost: float = 1) -> None:
+        """Wait until the bucket holds enough tokens, then debit them"""
+        # A single request may never need more than a full bucket
+        cost = min(cost, self.capacity)
+        async with self._lock:
+            self._refill()
+            if self.tokens < cost:
+                await asyncio.sleep((cost - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= cost
+
+class AdaptiveConcurrencyLimiter:
+    """Bounds in-flight requests, adjusting the limit by additive increase and multiplicative decrease"""
+    def __init__(self, initial: int, maximum: int):
+        self.limit = initial
+        self.maximum = maximum
+        self.active = 0
+        self.last_change = time.monotonic()
+        self.last_decrease = float("-inf")  # Nothing has been halved yet
+        self._condition = asyncio.Condition()
+    
+    async def __aenter__(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+    
+    async def __aexit__(self, *exc_info) -> None:
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+    
+    def set_maximum(self, maximum: int) -> None:
+        """Cap the limit, e.g. to a fraction of the API's request allowance"""
+        self.maximum = max(1, maximum)
+        self.limit = min(self.limit, self.maximum)
+    
+    def record_success(self) -> None:
+        """Allow one more concurrent request after a sustained period without overload"""
+        now = time.monotonic()
+        if self.limit < self.maximum and now - self.last_change >= CONCURRENCY_INCREASE_INTERVAL:
+            self.limit += 1
+            self.last_change = now
+            logger.info(f"Increasing request concurrency to {self.limit}")
+    
+    def record_overload(self) -> None:
+        """Halve the limit after the API signals it is overloaded, at most once per reaction window"""
+        # Requests already in flight when the limit dropped report the same overload
+        now = time.monotonic()
+        if now - self.last_decrease < OVERLOAD_REACTION_WINDOW:
+            return
+        self.limit = max(1, self.limit // 2)
+        self.last_change = self.last_decrease = now
+        logger.warning(f"Reducing request concurrency to {self.limit}")
+
 class RateLimitTracker:
     def __init__(self):
         self.requests_limit = 100  # Default values, will be updated from headers
-        self.tokens_limit = 10000
-        self.requests_remaining = 100
-        self.tokens_remaining = 10000
-        self.requests_reset_time = None
-        self.tokens_reset_time = None
+        self.tokens_limit = None  # Only enforced once the API reports a token limit
+        self.requests_bucket = TokenBucket(self.requests_limit, self.requests_limit / RATE_LIMIT_WINDOW)
+        self.tokens_bucket = None
         self.last_updated = datetime.now()
     
     def update_from_headers(self, headers: Dict[str, str]) -> None:
         """Update rate limit information from API response headers"""
         try:
-            # Update limits if headers are present
             if 'x-ratelimit-limit-requests' in headers:
                 self.requests_limit = int(headers['x-ratelimit-limit-requests'])
+                remaining = headers.get('x-ratelimit-remaining-requests')
+                self.requests_bucket.update(self.requests_limit, int(remaining) if remaining is not None else None)
+            
             if 'x-ratelimit-limit-tokens' in headers:
                 self.tokens_limit = int(headers['x-ratelimit-limit-tokens'])
-            if 'x-ratelimit-remaining-requests' in headers:
-                self.requests_remaining = int(headers['x-ratelimit-remaining-requests'])
-            if 'x-ratelimit-remaining-tokens' in headers:
-                self.tokens_remaining = int(headers['x-ratelimit-remaining-tokens'])
+                if self.tokens_bucket is None:
+                    self.tokens_bucket = TokenBucket(self.tokens_limit, self.tokens_limit / RATE_LIMIT_WINDOW)
+                remaining = headers.get('x-ratelimit-remaining-tokens')
+                self.tokens_bucket.update(self.tokens_limit, int(remaining) if remaining is not None else None)
             
-            # Update reset times
-            now = datetime.now()
-            if 'x-ratelimit-reset-requests' in headers:
-                reset_seconds = int(headers['x-ratelimit-reset-requests'])
-                self.requests_reset_time = now + timedelta(seconds=reset_seconds)
-            if 'x-ratelimit-reset-tokens' in headers:
-                reset_seconds = int(headers['x-ratelimit-reset-tokens'])
-                self.tokens_reset_time = now + timedelta(seconds=reset_seconds)
-            
-            self.last_updated = now
-            logger.debug(f"Rate limits updated: {self.requests_remaining}/{self.requests_limit} requests, "
-                         f"{self.tokens_remaining}/{self.tokens_limit} tokens")
+            self.last_updated = datetime.now()
+            logger.debug(f"Rate limits updated: {self.requests_limit} requests, "
+                         f"{self.tokens_limit} tokens per {RATE_LIMIT_WINDOW}s")
         except (ValueError, KeyError) as e:
             logger.warning(f"Error parsing rate limit headers: {e}")
     
-    async def wait_if_needed(self) -> None:
-        """Wait if we're close to rate limits"""
-        now = datetime.now()
-        
-        # Default thresholds - be conservative
-        request_threshold = max(1, int(self.requests_limit * 0.1))  # 10% of limit or at least 1
-        token_threshold = max(100, int(self.tokens_limit * 0.1))    # 10% of limit or at least 100
-        
-        # Check if we need to wait for requests limit
-        if self.requests_remaining <= request_threshold and self.requests_reset_time:
-            wait_time = (self.requests_reset_time - now).total_seconds()
-            if wait_time > 0:
-                logger.info(f"Approaching request rate limit. Waiting {wait_time:.1f} seconds.")
-                await asyncio.sleep(wait_time + 1)  # Add 1 second buffer
-        
-        # Check if we need to wait for tokens limit
-        if self.tokens_remaining <= token_threshold and self.tokens_reset_time:
-            wait_time = (self.tokens_reset_time - now).total_seconds()
-            if wait_time > 0:
-                logger.info(f"Approaching token rate limit. Waiting {wait_time:.1f} seconds.")
-                await asyncio.sleep(wait_time + 1)  # Add 1 second buffer
+    async def acquire(self, estimated_tokens: int) -> None:
+        """Wait until both the request and token budgets allow another request"""
+        await self.requests_bucket.acquire(1)
+        if self.tokens_bucket is not None:
+            await self.tokens_bucket.acquire(estimated_tokens)
 
 # Progress tracking
 class ProgressTracker:
@@ -127,18 +209,12 @@ class ProgressTracker:
         self.errors = {}  # Map of component -> error details
         self.completed_count = 0
         self.total_count = 0
-        self.logs = []
+        # Bounded log of (unix_time, level, message, component, details), formatted on save
+        self.logs = deque(maxlen=MAX_PROGRESS_LOG_ENTRIES)
         
     def log(self, level: str, message: str, component: str = "general", details: Any = None) -> None:
         """Add an entry to the log with timestamp"""
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "level": level,
-            "message": message,
-            "component": component,
-            "details": details
-        }
-        self.logs.append(log_entry)
+        self.logs.append((time.time(), level, message, component, details))
         # Also log to standard logger
         if level == "info":
             logger.info(f"[{component}] {message}")
@@ -149,22 +225,25 @@ class ProgressTracker:
         elif level == "success":
             logger.info(f"[{component}] {message}")
     
-    def set_outline_complete(self, units_count: int) -> None:
+    def set_outline_complete(self, units_count: int, subunit_count: int) -> None:
         """Mark the outline generation as complete and update total count"""
         self.outline_status = "complete"
         self.status = "enhancing-descriptions"
+        self.total_count = subunit_count
         self.log("success", f"Outline generated with {units_count} units", "outline")
     
     def set_descriptions_complete(self, subunit_count: int) -> None:
-        """Mark the description enhancement as complete and initialize content tracking"""
+        """Mark the description enhancement as complete"""
         self.description_status = "complete"
-        self.status = "generating-content"
-        self.total_count = subunit_count
-        self.content_status = {i: "pending" for i in range(1, subunit_count + 1)}
+        # Content generation overlaps with enhancement and may already be finished
+        if self.status == "enhancing-descriptions":
+            self.status = "generating-content"
         self.log("success", f"Descriptions enhanced for {subunit_count} subunits", "descriptions")
     
     def start_subunit_content(self, subunit_id: str) -> None:
         """Mark a subunit as in-progress for content generation"""
+        if self.status == "enhancing-descriptions":
+            self.status = "generating-content"
         self.content_status[subunit_id] = "in-progress"
         self.log("info", f"Starting content generation", f"subunit-{subunit_id}")
     
@@ -202,27 +281,122 @@ class ProgressTracker:
             "error_count": len(self.errors)
         }
     
-    def save_progress(self, filepath: str) -> None:
+    def get_logs(self) -> List[Dict[str, Any]]:
+        """Get the log entries in their serialized form"""
+        return [
+            {
+                "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+                "level": level,
+                "message": message,
+                "component": component,
+                "details": details
+            }
+            for timestamp, level, message, component, details in self.logs
+        ]
+    
+    async def save_progress(self, filepath: str) -> None:
         """Save progress data to a file"""
-        with open(filepath, 'w') as f:
-            json.dump({
-                "summary": self.get_summary(),
-                "content_status": self.content_status,
-                "errors": self.errors,
-                "logs": self.logs
-            }, f, indent=2)
+        data = orjson.dumps({
+            "summary": self.get_summary(),
+            "content_status": self.content_status,
+            "errors": self.errors,
+            "logs": self.get_logs()
+        }, option=orjson.OPT_INDENT_2)
+        # Write to a temp file first so readers never see a partially written checkpoint
+        tmp_path = f"{filepath}.tmp"
+        async with aiofiles.open(tmp_path, 'wb') as f:
+            await f.write(data)
+        os.replace(tmp_path, filepath)
+
+# Response caching
+class ResponseCache:
+    """Content-addressed disk cache for successful API responses"""
+    # Only completed generations are cached; errors and filtered responses are retried
+    CACHEABLE_FINISH_REASONS = {"stop", "length", "tool_calls"}
+    
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.enabled = os.environ.get(CACHE_ENABLED_ENV_VAR, "1") != "0"
+        self.force_refresh = os.environ.get(CACHE_FORCE_REFRESH_ENV_VAR) == "1"
+        if self.enabled:
+            os.makedirs(self.cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """Hash a request payload into a cache key"""
+        payload_json = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+        return hashlib.blake2b(payload_json, digest_size=20).hexdigest()
+    
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached response for a key, or None on a miss"""
+        if not self.enabled or self.force_refresh:
+            return None
+        try:
+            async with aiofiles.open(self._path_for(key), 'rb') as f:
+                return orjson.loads(await f.read())
+        except FileNotFoundError:
+            return None
+        except orjson.JSONDecodeError:
+            logger.warning(f"Ignoring corrupt cache entry {key}")
+            return None
+        except OSError as e:
+            logger.warning(f"Could not read cache entry {key}: {e}")
+            return None
+    
+    async def set(self, key: str, response: Dict[str, Any]) -> None:
+        """Store a response if it represents a completed generation"""
+        if not self.enabled:
+            return
+        try:
+            finish_reason = response["choices"][0].get("finish_reason")
+        except (KeyError, IndexError, TypeError, AttributeError):
+            return
+        if finish_reason not in self.CACHEABLE_FINISH_REASONS:
+            return
+        
+        path = self._path_for(key)
+        # Write to a temporary file first so readers never see a partial entry. The name is
+        # unique per write, since identical requests can be stored concurrently
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as f:
+                await f.write(orjson.dumps(response))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # A response that failed to cache is still a successful response
+            logger.warning(f"Could not write cache entry {key}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
 
 # API Client for Perplexity
 class PerplexityClient:
     def __init__(self, api_key: str):
         self.api_key = api_key
         self.rate_tracker = RateLimitTracker()
+        self.cache = ResponseCache()
+        self.concurrency = AdaptiveConcurrencyLimiter(PARALLEL_REQUESTS, MAX_PARALLEL_REQUESTS)
         self.session = None
     
     async def ensure_session(self):
         """Ensure we have an active aiohttp session"""
         if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession()
+            # One long-lived session with a pool sized to our maximum concurrency keeps
+            # connections and TLS state to the API warm across requests and retries
+            connector = aiohttp.TCPConnector(
+                limit=MAX_PARALLEL_REQUESTS,
+                limit_per_host=MAX_PARALLEL_REQUESTS,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT, sock_connect=30)
+            )
         return self.session
     
     async def close(self):
@@ -230,6 +404,12 @@ class PerplexityClient:
         if self.session and not self.session.closed:
             await self.session.close()
     
+    async def __aenter__(self) -> "PerplexityClient":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+    
     async def send_request(self, prompt: str, model: str = "sonar", 
                         temperature: float = 0.7, max_tokens: int = 4000) -> Dict[str, Any]:
         """
@@ -254,58 +434,48 @@ class PerplexityClient:
             "max_tokens": max_tokens
         }
         
+        # Serve identical requests from the response cache
+        cache_key = self.cache.make_key(payload)
+        cached_response = await self.cache.get(cache_key)
+        if cached_response is not None:
+            logger.debug(f"Using cached response {cache_key}")
+            return cached_response
+        
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
         
-        # Check rate limits before making request
-        await self.rate_tracker.wait_if_needed()
+        # Pace the request against the request and token budgets; the prompt is
+        # estimated at ~4 characters per token
+        await self.rate_tracker.acquire(len(prompt) // 4 + max_tokens)
         
         # Attempt the request with retries
         retry_count = 0
         while retry_count <= MAX_RETRIES:
             try:
-                async with session.post(API_ENDPOINT, json=payload, headers=headers) as response:
-                    # Update rate limits from response headers
-                    self.rate_tracker.update_from_headers(response.headers)
-                    
-                    if response.status == 200:
-                        # Success case
-                        return await response.json()
-                    elif response.status == 429:
-                        # Rate limit exceeded
-                        reset_time = response.headers.get('x-ratelimit-reset-requests', 60)
-                        try:
-                            wait_time = int(reset_time) + random.randint(1, 5)  # Add some jitter
-                        except ValueError:
-                            wait_time = 60  # Default to 60 seconds if we can't parse
+                # Only the request itself holds a concurrency slot, not the backoff below
+                async with self.concurrency:
+                    async with session.post(API_ENDPOINT, json=payload, headers=headers) as response:
+                        self.update_limits(response)
                         
-                        logger.warning(f"Rate limit exceeded. Waiting {wait_time} seconds before retry.")
-                        await asyncio.sleep(wait_time)
-                        retry_count += 1
-                    elif response.status >= 500:
-                        # Server error, retry
-                        wait_time = RETRY_DELAY_BASE ** retry_count + random.random()
-                        logger.warning(f"Server error (status {response.status}). Retry {retry_count+1}/{MAX_RETRIES} after {wait_time:.1f}s")
-                        await asyncio.sleep(wait_time)
-                        retry_count += 1
-                    else:
-                        # Client error or other issues
-                        error_text = await response.text()
-                        raise Exception(f"API request failed with status {response.status}: {error_text}")
+                        if response.status == 200:
+                            # Success case
+                            response_data = await response.json()
+                            self.concurrency.record_success()
+                            await self.cache.set(cache_key, response_data)
+                            return response_data
+                        
+                        wait_time = await self.retry_delay(response, retry_count)
+                
+                await asyncio.sleep(wait_time)
+                retry_count += 1
             
             except aiohttp.ClientError as e:
                 wait_time = RETRY_DELAY_BASE ** retry_count + random.random()
                 logger.warning(f"Network error: {e}. Retry {retry_count+1}/{MAX_RETRIES} after {wait_time:.1f}s")
                 await asyncio.sleep(wait_time)
                 retry_count += 1
-                
-                # Recreate session if connection issues
-                if retry_count % 2 == 0:
-                    await self.close()
-                    self.session = None
-                    await self.ensure_session()
                     
             except Exception as e:
                 # Unexpected error
@@ -315,100 +485,245 @@ class PerplexityClient:
         # If we've exhausted retries
         raise Exception(f"Failed after {MAX_RETRIES} retries")
     
+    async def send_request_stream(self, prompt: str, model: str = "sonar",
+                                  temperature: float = 0.7, max_tokens: int = 4000,
+                                  on_start: Optional[Callable[[], None]] = None) -> AsyncIterator[str]:
+        """
+        Send a streaming request to the Perplexity API, yielding content as it arrives
+        
+        Retries are only attempted until the first content is received. The assembled
+        response is cached under the same key as the equivalent non-streaming request.
+        
+        Args:
+            prompt: The prompt text to send
+            model: The model to use
+            temperature: Temperature setting (0.0 to 1.0)
+            max_tokens: Maximum tokens in the response
+            on_start: Called once, when the request first gets a concurrency slot
+                or is served from the cache
+            
+        Yields:
+            Pieces of the generated content in order
+        """
+        session = await self.ensure_session()
+        
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        
+        # A cached response is replayed as a single piece
+        cache_key = self.cache.make_key(payload)
+        cached_response = await self.cache.get(cache_key)
+        if cached_response is not None:
+            logger.debug(f"Using cached response {cache_key}")
+            if on_start is not None:
+                on_start()
+            yield await self.extract_content(cached_response)
+            return
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream"
+        }
+        
+        await self.rate_tracker.acquire(len(prompt) // 4 + max_tokens)
+        
+        content_parts = []
+        retry_count = 0
+        while retry_count <= MAX_RETRIES:
+            try:
+                async with self.concurrency:
+                    if on_start is not None:
+                        on_start()
+                        on_start = None
+                    async with session.post(API_ENDPOINT, json={**payload, "stream": True}, headers=headers) as response:
+                        self.update_limits(response)
+                        
+                        if response.status == 200:
+                            # Each server-sent event carries a completion chunk with a content delta
+                            last_chunk = {}
+                            finish_reason = None
+                            async for line in response.content:
+                                if not line.startswith(b"data:"):
+                                    continue
+                                data = line[5:].strip()
+                                if data == b"[DONE]":
+                                    break
+                                last_chunk = orjson.loads(data)
+                                choice = last_chunk.get("choices", [{}])[0]
+                                finish_reason = choice.get("finish_reason") or finish_reason
+                                delta = choice.get("delta", {}).get("content")
+                                if delta:
+                                    content_parts.append(delta)
+                                    yield delta
+                            
+                            self.concurrency.record_success()
+                            response_data = {
+                                **last_chunk,
+                                "choices": [{
+                                    "index": 0,
+                                    "message": {"role": "assistant", "content": "".join(content_parts)},
+                                    "finish_reason": finish_reason
+                                }]
+                            }
+                            await self.cache.set(cache_key, response_data)
+                            return
+                        
+                        wait_time = await self.retry_delay(response, retry_count)
+                
+                await asyncio.sleep(wait_time)
+                retry_count += 1
+            
+            except aiohttp.ClientError as e:
+                # Content already handed to the caller can't be taken back
+                if content_parts:
+                    raise
+                wait_time = RETRY_DELAY_BASE ** retry_count + random.random()
+                logger.warning(f"Network error: {e}. Retry {retry_count+1}/{MAX_RETRIES} after {wait_time:.1f}s")
+                await asyncio.sleep(wait_time)
+                retry_count += 1
+        
+        raise Exception(f"Failed after {MAX_RETRIES} retries")
+    
+    def update_limits(self, response: aiohttp.ClientResponse) -> None:
+        """Update rate limits and the concurrency cap from API response headers"""
+        self.rate_tracker.update_from_headers(response.headers)
+        self.concurrency.set_maximum(min(MAX_PARALLEL_REQUESTS, self.rate_tracker.requests_limit // 2))
+    
+    async def retry_delay(self, response: aiohttp.ClientResponse, retry_count: int) -> float:
+        """Get the delay before retrying a failed response, raising if it can't be retried"""
+        if response.status == 429:
+            # Rate limit exceeded
+            self.concurrency.record_overload()
+            reset_time = response.headers.get('x-ratelimit-reset-requests', 60)
+            try:
+                wait_time = int(reset_time) + random.randint(1, 5)  # Add some jitter
+            except ValueError:
+                wait_time = 60  # Default to 60 seconds if we can't parse
+            
+            logger.warning(f"Rate limit exceeded. Waiting {wait_time} seconds before retry.")
+            return wait_time
+        
+        if response.status >= 500:
+            # Server error, retry
+            self.concurrency.record_overload()
+            wait_time = RETRY_DELAY_BASE ** retry_count + random.random()
+            logger.warning(f"Server error (status {response.status}). Retry {retry_count+1}/{MAX_RETRIES} after {wait_time:.1f}s")
+            return wait_time
+        
+        # Client error or other issues
+        error_text = await response.text()
+        raise Exception(f"API request failed with status {response.status}: {error_text}")
+    
     async def extract_content(self, response: Dict[str, Any]) -> str:
         """Extract the content from a Perplexity API response"""
         try:
             return response['choices'][0]['message']['content']
         except (KeyError, IndexError):
-            logger.error(f"Unexpected API response format: {json.dumps(response)[:200]}...")
+            logger.error(f"Unexpected API response format: {orjson.dumps(response).decode()[:200]}...")
             raise ValueError("Invalid API response format")
 
 # File Utilities
 class FileUtils:
+    _prompt_cache: Dict[str, str] = {}  # Prompt name -> template, prompts don't change during a run
+    _created_dirs: set = set()  # Directories already created during this process
+    
+    @staticmethod
+    async def ensure_dir(path: str) -> None:
+        """Create a directory (and its parents) once, off the event loop"""
+        if path in FileUtils._created_dirs:
+            return
+        await asyncio.to_thread(os.makedirs, path, exist_ok=True)
+        FileUtils._created_dirs.add(path)
+    
     @staticmethod
     async def read_prompt(prompt_name: str) -> str:
         """Read a prompt file from the prompts directory"""
+        if prompt_name in FileUtils._prompt_cache:
+            return FileUtils._prompt_cache[prompt_name]
+        
         prompt_path = os.path.join(PROMPTS_DIR, f"{prompt_name}.md")
         async with aiofiles.open(prompt_path, 'r') as f:
-            return await f.read()
+            prompt = await f.read()
+        FileUtils._prompt_cache[prompt_name] = prompt
+        return prompt
     
     @staticmethod
     async def save_json(data: Any, filename: str, course_folder: Optional[str] = None) -> str:
         """Save data as JSON to the output directory"""
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        
         # If course folder is provided, save inside that folder
-        if course_folder:
-            target_dir = os.path.join(OUTPUT_DIR, course_folder)
-            os.makedirs(target_dir, exist_ok=True)
-            filepath = os.path.join(target_dir, filename)
-        else:
-            filepath = os.path.join(OUTPUT_DIR, filename)
+        target_dir = os.path.join(OUTPUT_DIR, course_folder) if course_folder else OUTPUT_DIR
+        await FileUtils.ensure_dir(target_dir)
+        filepath = os.path.join(target_dir, filename)
             
-        async with aiofiles.open(filepath, 'w') as f:
-            await f.write(json.dumps(data, indent=2))
+        async with aiofiles.open(filepath, 'wb') as f:
+            await f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
         return filepath
     
     @staticmethod
-    async def save_markdown(content: str, unit_info: Dict[str, Any], subunit_info: Dict[str, Any], 
-                          course_info: Dict[str, Any], course_folder: str) -> str:
-        """Save content as Markdown to the output directory with frontmatter in organized folders"""
-        # Create main course folder
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-        course_dir = os.path.join(OUTPUT_DIR, course_folder)
-        os.makedirs(course_dir, exist_ok=True)
-        
-        # Create unit folder
-        unit_number = unit_info.get("unit_number", "unknown")
-        unit_title = FileUtils.sanitize_filename(unit_info.get("unit_title", f"Unit-{unit_number}"))
-        unit_folder = f"unit{unit_number}-{unit_title}"
-        unit_dir = os.path.join(course_dir, unit_folder)
-        os.makedirs(unit_dir, exist_ok=True)
-        
-        # Create file name for subunit
-        subunit_number = subunit_info.get("subunit_number", "unknown")
-        subunit_title = FileUtils.sanitize_filename(subunit_info.get("subunit_title", f"Subunit-{subunit_number}"))
-        filename = f"subunit{subunit_number}-{subunit_title}.md"
-        
-        filepath = os.path.join(unit_dir, filename)
-        
+    def build_frontmatter(unit_info: Dict[str, Any], subunit_info: Dict[str, Any],
+                          course_info: Dict[str, Any]) -> str:
+        """Build the YAML frontmatter block that starts a subunit's Markdown file"""
         # Create frontmatter with metadata
         frontmatter = {
             "title": subunit_info.get("subunit_title", ""),
             "unit": unit_info.get("unit_title", ""),
             "unit_number": unit_info.get("unit_number", ""),
-            "subunit_number": subunit_number,
+            "subunit_number": subunit_info.get("subunit_number", "unknown"),
             "course": course_info.get("title", ""),
             "difficulty_level": course_info.get("difficulty_level", ""),
             "learning_objectives": subunit_info.get("learning_objectives", []),
             "key_topics": subunit_info.get("key_topics", [])
         }
         
-        # Format frontmatter as YAML
-        yaml_frontmatter = "---\n"
+        # Format frontmatter as YAML. Values are written as JSON strings, which are
+        # valid YAML double-quoted scalars with any embedded quotes escaped
+        lines = ["---"]
         for key, value in frontmatter.items():
             if isinstance(value, list):
-                yaml_frontmatter += f"{key}:\n"
-                for item in value:
-                    yaml_frontmatter += f"  - \"{item}\"\n"
+                lines.append(f"{key}:")
+                lines.extend(f"  - {orjson.dumps(str(item)).decode()}" for item in value)
             else:
-                yaml_frontmatter += f"{key}: \"{value}\"\n"
-        yaml_frontmatter += "---\n\n"
+                lines.append(f"{key}: {orjson.dumps(str(value)).decode()}")
+        lines.append("---\n\n")
+        return "\n".join(lines)
+    
+    @staticmethod
+    def subunit_markdown_path(unit_info: Dict[str, Any], subunit_info: Dict[str, Any], course_folder: str) -> str:
+        """Get the path a subunit's Markdown content is saved to"""
+        unit_number = unit_info.get("unit_number", "unknown")
+        unit_title = FileUtils.sanitize_filename(unit_info.get("unit_title", f"Unit-{unit_number}"))
+        unit_folder = f"unit{unit_number}-{unit_title}"
         
-        # Combine frontmatter with content
-        full_content = yaml_frontmatter + content
+        subunit_number = subunit_info.get("subunit_number", "unknown")
+        subunit_title = FileUtils.sanitize_filename(subunit_info.get("subunit_title", f"Subunit-{subunit_number}"))
+        filename = f"subunit{subunit_number}-{subunit_title}.md"
         
-        async with aiofiles.open(filepath, 'w') as f:
-            await f.write(full_content)
-        return filepath
+        return os.path.join(OUTPUT_DIR, course_folder, unit_folder, filename)
+    
+    @staticmethod
+    async def has_saved_content(filepath: str) -> bool:
+        """Check whether a Markdown file exists with complete frontmatter and a body"""
+        if not os.path.isfile(filepath):
+            return False
+        async with aiofiles.open(filepath, 'r') as f:
+            text = await f.read()
+        if not text.startswith("---\n"):
+            return False
+        end = text.find("\n---\n", 3)
+        return end != -1 and bool(text[end + 5:].strip())
     
     @staticmethod
     def sanitize_filename(text: str) -> str:
         """Convert text to a valid filename"""
         # Replace spaces and special chars with underscores
-        sanitized = re.sub(r'[^\w\-\.]', '_', text)
+        sanitized = UNSAFE_FILENAME_CHARS_PATTERN.sub('_', text)
         # Ensure no double underscores
-        sanitized = re.sub(r'__+', '_', sanitized)
+        sanitized = REPEATED_UNDERSCORES_PATTERN.sub('_', sanitized)
         # Truncate if too long
         if len(sanitized) > 50:
             sanitized = sanitized[:50]
@@ -421,17 +736,114 @@ class FileUtils:
         safe_title = FileUtils.sanitize_filename(course_title)
         folder_name = f"{safe_title}-{timestamp}"
         return folder_name
+    
+    @staticmethod
+    def find_existing_course_folder(course_title: str) -> Optional[str]:
+        """Find the most recent course folder with a saved outline for a requested title
+
+        Folders are named after the outline's title, which can differ from the
+        requested one, so the title recorded in course_request.json is matched.
+        """
+        if not os.path.isdir(OUTPUT_DIR):
+            return None
+        
+        candidates = []
+        with os.scandir(OUTPUT_DIR) as entries:
+            for entry in entries:
+                timestamp_match = COURSE_FOLDER_TIMESTAMP_PATTERN.search(entry.name)
+                if not timestamp_match or not os.path.isfile(os.path.join(entry.path, "course_outline.json")):
+                    continue
+                try:
+                    with open(os.path.join(entry.path, "course_request.json"), 'rb') as f:
+                        requested_title = orjson.loads(f.read()).get("title")
+                except (OSError, orjson.JSONDecodeError):
+                    continue
+                if requested_title == course_title:
+                    candidates.append((timestamp_match.group(1), entry.name))
+        # Timestamps are zero-padded, so the newest folder sorts last
+        return max(candidates)[1] if candidates else None
 
 # Main Pipeline Components
 class CoursePipeline:
-    def __init__(self, api_key: str, course_title: str, course_description: str):
+    def __init__(self, api_key: str, course_title: str, course_description: str, resume: bool = False):
         self.api_client = PerplexityClient(api_key)
         self.course_title = course_title
         self.course_description = course_description
         self.progress = ProgressTracker(course_title)
         self.outline = None
         self.enhanced_descriptions = None
+        # Lookups keyed by str(subunit_number), filled as the outline and descriptions arrive
+        self.units_by_subunit_id = {}  # subunit_id -> (unit, subunit) from the outline
+        self.descriptions_by_subunit_id = {}  # subunit_id -> enhanced description
         self.course_folder = None
+        self.checkpoint_task = None
+        self.content_prompt_prefix = None  # Content prompt up to the per-subunit context
+        # When resuming, saved files in the latest course folder are reused instead of regenerated
+        self.resume = resume
+    
+    async def __aenter__(self) -> "CoursePipeline":
+        await self.api_client.__aenter__()
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        # Closes the API client's pooled session
+        await self.api_client.__aexit__(*exc_info)
+    
+    def progress_path(self, filename: str) -> str:
+        """Get the path of a progress file inside the course folder"""
+        if self.course_folder:
+            return os.path.join(OUTPUT_DIR, self.course_folder, filename)
+        return os.path.join(OUTPUT_DIR, filename)
+    
+    def schedule_checkpoint(self) -> None:
+        """Save a progress checkpoint in the background unless one is already being written"""
+        if self.checkpoint_task is not None and not self.checkpoint_task.done():
+            return
+        self.checkpoint_task = asyncio.create_task(
+            self.progress.save_progress(self.progress_path("progress_checkpoint.json"))
+        )
+    
+    async def load_saved_state(self) -> bool:
+        """Restore the outline and enhanced descriptions from the latest folder for this course"""
+        course_folder = FileUtils.find_existing_course_folder(self.course_title)
+        if course_folder is None:
+            self.progress.log("warning", "No saved course found to resume, starting from scratch", "pipeline")
+            return False
+        
+        self.course_folder = course_folder
+        course_dir = os.path.join(OUTPUT_DIR, course_folder)
+        self.progress.log("info", f"Resuming course from {course_dir}", "pipeline")
+        
+        async with aiofiles.open(os.path.join(course_dir, "course_outline.json"), 'rb') as f:
+            self.outline = orjson.loads(await f.read())
+        units = self.outline.get("units", [])
+        subunit_count = sum(len(unit.get("subunits", [])) for unit in units)
+        self.progress.set_outline_complete(len(units), subunit_count)
+        
+        # Descriptions are only saved once every unit is enhanced, so they are all or nothing
+        descriptions_path = os.path.join(course_dir, "enhanced_descriptions.json")
+        if os.path.isfile(descriptions_path):
+            async with aiofiles.open(descriptions_path, 'rb') as f:
+                self.enhanced_descriptions = orjson.loads(await f.read())
+            for desc in self.enhanced_descriptions:
+                self.descriptions_by_subunit_id[str(desc["subunit_number"])] = desc["subunit_description"]
+        
+        return True
+    
+    async def is_subunit_generated(self, subunit_id: str) -> bool:
+        """Check whether a subunit's content was already saved by an earlier run"""
+        if subunit_id not in self.units_by_subunit_id:
+            return False
+        unit_info, subunit_info = self.units_by_subunit_id[subunit_id]
+        filepath = FileUtils.subunit_markdown_path(unit_info, subunit_info, self.course_folder)
+        return await FileUtils.has_saved_content(filepath)
+    
+    async def get_content_prompt_prefix(self) -> str:
+        """Get the part of every content generation prompt that precedes the subunit context"""
+        if self.content_prompt_prefix is None:
+            prompt_template = await FileUtils.read_prompt("subunit-content-generation-prompt")
+            self.content_prompt_prefix = f"{prompt_template}\n\n## Input Context\n\n```json\n"
+        return self.content_prompt_prefix
     
     async def generate_outline(self) -> Dict[str, Any]:
         """Generate the initial course outline"""
@@ -458,42 +870,55 @@ class CoursePipeline:
         json_content = self._extract_json(content)
         
         try:
-            outline = json.loads(json_content)
+            outline = orjson.loads(json_content)
             
             # Create course folder
             self.course_folder = FileUtils.create_course_folder(outline.get("course", {}).get("title", self.course_title))
             
+            # Record the requested title so --resume can find this folder again
+            await FileUtils.save_json(
+                {"title": self.course_title, "description": self.course_description},
+                "course_request.json", self.course_folder
+            )
+            
             # Save the outline to a file
             filepath = await FileUtils.save_json(outline, "course_outline.json", self.course_folder)
             self.progress.log("info", f"Outline saved to {filepath}", "outline")
             
-            # Count the total number of units
-            unit_count = len(outline.get("units", []))
-            self.progress.set_outline_complete(unit_count)
+            # Count the total number of units and subunits
+            units = outline.get("units", [])
+            subunit_count = sum(len(unit.get("subunits", [])) for unit in units)
+            self.progress.set_outline_complete(len(units), subunit_count)
             
             return outline
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             self.progress.log("error", f"Failed to parse outline JSON: {e}", "outline", json_content[:500])
             raise
     
-    async def enhance_descriptions(self, outline: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Enhance the descriptions for each subunit"""
-        self.progress.log("info", "Starting description enhancement", "descriptions")
+    async def enhance_unit_descriptions(self, outline: Dict[str, Any], unit: Dict[str, Any],
+                                        attempt: int = 0) -> List[Dict[str, Any]]:
+        """Enhance the descriptions for the subunits of a single unit"""
+        unit_number = unit.get("unit_number")
         
         # Read the description enhancement prompt
         prompt_template = await FileUtils.read_prompt("description-enhancement-prompt")
         
-        # Prepare the outline JSON for the prompt
-        outline_json = json.dumps(outline, indent=2)
+        # The prompt accepts any outline, so send the course with just this unit
+        unit_outline = {"course": outline.get("course", {}), "units": [unit]}
+        outline_json = orjson.dumps(unit_outline, option=orjson.OPT_INDENT_2).decode()
         
         # Create the full prompt
         prompt = f"{prompt_template}\n\n## Input\n\n```json\n{outline_json}\n```"
         
+        # Budget for every subunit's description; a retry doubles it, since a truncated
+        # response is the usual reason the JSON fails to parse
+        max_tokens = DESCRIPTION_TOKENS_OVERHEAD + DESCRIPTION_TOKENS_PER_SUBUNIT * len(unit.get("subunits", []))
+        
         # Send the request to the API
         response = await self.api_client.send_request(
             prompt=prompt, 
             temperature=0.7,
-            max_tokens=8000  # Allow for longer response as we need detailed descriptions
+            max_tokens=max_tokens * 2 ** attempt
         )
         
         # Extract and parse the JSON response
@@ -503,33 +928,90 @@ class CoursePipeline:
         json_content = self._extract_json(content)
         
         try:
-            enhanced_descriptions = json.loads(json_content)
+            unit_descriptions = orjson.loads(json_content)
+            self.progress.log("info", f"Descriptions enhanced for unit {unit_number}", "descriptions")
+            return unit_descriptions
+        except orjson.JSONDecodeError as e:
+            self.progress.log("error", f"Failed to parse enhanced descriptions JSON for unit {unit_number}: {e}", "descriptions", json_content[:500])
+            raise
+    
+    async def enhance_descriptions(self, outline: Dict[str, Any],
+                                   subunit_queue: Optional[asyncio.Queue] = None) -> List[Dict[str, Any]]:
+        """
+        Enhance the descriptions for each subunit, with one concurrent request per unit
+        
+        Args:
+            outline: The course outline
+            subunit_queue: If given, each unit's subunits are queued for content
+                generation as soon as that unit's descriptions are ready
             
-            # Save the enhanced descriptions to a file
-            filepath = await FileUtils.save_json(enhanced_descriptions, "enhanced_descriptions.json", self.course_folder)
-            self.progress.log("info", f"Enhanced descriptions saved to {filepath}", "descriptions")
+        Returns:
+            The enhanced descriptions for all subunits
+        """
+        self.progress.log("info", "Starting description enhancement", "descriptions")
+        
+        failed_units = []
+        
+        async def enhance_unit(unit: Dict[str, Any]) -> List[Dict[str, Any]]:
+            # A unit that keeps failing only costs its own subunits, not the whole course
+            for attempt in range(DESCRIPTION_ENHANCEMENT_ATTEMPTS):
+                try:
+                    unit_descriptions = await self.enhance_unit_descriptions(outline, unit, attempt)
+                    break
+                except Exception as e:
+                    error = str(e)
+                    self.progress.log("warning", f"Enhancing unit {unit.get('unit_number')} failed "
+                                      f"(attempt {attempt + 1}/{DESCRIPTION_ENHANCEMENT_ATTEMPTS}): {error}", "descriptions")
+            else:
+                failed_units.append(unit.get("unit_number"))
+                for subunit in unit.get("subunits", []):
+                    self.progress.error_in_subunit(str(subunit.get("subunit_number")),
+                                                   f"Description enhancement failed: {error}")
+                return []
             
-            # Count the total number of subunits
-            subunit_count = len(enhanced_descriptions)
-            self.progress.set_descriptions_complete(subunit_count)
+            for desc in unit_descriptions:
+                self.descriptions_by_subunit_id[str(desc["subunit_number"])] = desc["subunit_description"]
             
-            return enhanced_descriptions
-        except json.JSONDecodeError as e:
-            self.progress.log("error", f"Failed to parse enhanced descriptions JSON: {e}", "descriptions", json_content[:500])
+            if subunit_queue is not None:
+                for subunit in unit.get("subunits", []):
+                    await subunit_queue.put(subunit)
+            return unit_descriptions
+        
+        # Requests share the client's rate limiter, so units can be sent all at once
+        tasks = [asyncio.create_task(enhance_unit(unit)) for unit in outline.get("units", [])]
+        try:
+            results = await asyncio.gather(*tasks)
+        except Exception:
+            for task in tasks:
+                task.cancel()
             raise
+        
+        # Keep the saved descriptions in outline order regardless of completion order
+        self.enhanced_descriptions = [desc for unit_descriptions in results for desc in unit_descriptions]
+        
+        if failed_units:
+            # Descriptions are saved all or nothing, so --resume enhances every unit again
+            self.progress.log("error", f"Descriptions could not be enhanced for units {failed_units}; "
+                              "their subunits were skipped", "descriptions")
+        else:
+            # Save the enhanced descriptions to a file
+            filepath = await FileUtils.save_json(self.enhanced_descriptions, "enhanced_descriptions.json", self.course_folder)
+            self.progress.log("info", f"Enhanced descriptions saved to {filepath}", "descriptions")
+        
+        self.progress.set_descriptions_complete(len(self.enhanced_descriptions))
+        
+        return self.enhanced_descriptions
     
-    async def generate_subunit_content(self, outline: Dict[str, Any], enhanced_descriptions: List[Dict[str, Any]],
-                                      subunit_info: Dict[str, Any]) -> str:
+    async def generate_subunit_content(self, subunit_info: Dict[str, Any]) -> str:
         """Generate content for a specific subunit"""
+        outline = self.outline
         subunit_number = subunit_info["subunit_number"]
         subunit_id = str(subunit_number)
         
-        self.progress.start_subunit_content(subunit_id)
         self.progress.log("info", f"Generating content for subunit {subunit_number}", f"subunit-{subunit_id}")
         
         # Find the enhanced description for this subunit
-        description = next((desc["subunit_description"] for desc in enhanced_descriptions 
-                           if str(desc["subunit_number"]) == str(subunit_number)), None)
+        description = self.descriptions_by_subunit_id.get(subunit_id)
         
         if not description:
             error_msg = f"No enhanced description found for subunit {subunit_number}"
@@ -537,23 +1019,11 @@ class CoursePipeline:
             raise ValueError(error_msg)
         
         # Find the unit information
-        unit_info = None
-        for unit in outline.get("units", []):
-            for subunit in unit.get("subunits", []):
-                if str(subunit.get("subunit_number")) == str(subunit_number):
-                    unit_info = unit
-                    subunit_info = subunit
-                    break
-            if unit_info:
-                break
-        
-        if not unit_info:
+        if subunit_id not in self.units_by_subunit_id:
             error_msg = f"Could not find unit information for subunit {subunit_number}"
             self.progress.error_in_subunit(subunit_id, error_msg)
             raise ValueError(error_msg)
-        
-        # Read the content generation prompt
-        prompt_template = await FileUtils.read_prompt("subunit-content-generation-prompt")
+        unit_info, subunit_info = self.units_by_subunit_id[subunit_id]
         
         # Create a context object with all the information needed
         context = {
@@ -572,27 +1042,46 @@ class CoursePipeline:
             "enhanced_description": description
         }
         
-        # Create the full prompt
-        prompt = f"{prompt_template}\n\n## Input Context\n\n```json\n{json.dumps(context, indent=2)}\n```"
-        
-        # Send the request to the API - use higher max_tokens for content generation
-        response = await self.api_client.send_request(
-            prompt=prompt, 
-            temperature=0.7,
-            max_tokens=12000  # Allow for very detailed content
-        )
+        # Create the full prompt from the shared prefix and this subunit's context
+        prompt_prefix = await self.get_content_prompt_prefix()
+        prompt = f"{prompt_prefix}{orjson.dumps(context, option=orjson.OPT_INDENT_2).decode()}\n```"
         
-        # Extract the content
-        content = await self.api_client.extract_content(response)
+        filepath = FileUtils.subunit_markdown_path(unit_info, subunit_info, self.course_folder)
+        await FileUtils.ensure_dir(os.path.dirname(filepath))
         
-        # Save the content to a file using the new folder structure and frontmatter
-        filepath = await FileUtils.save_markdown(
-            content, 
-            unit_info, 
-            subunit_info,
-            outline.get("course", {}),
-            self.course_folder
-        )
+        # Stream the content to a partial file that only replaces the Markdown file once
+        # complete, so an interrupted subunit is never mistaken for a finished one
+        partial_path = f"{filepath}.partial"
+        content_parts = []
+        try:
+            async with aiofiles.open(partial_path, 'w') as f:
+                await f.write(FileUtils.build_frontmatter(unit_info, subunit_info, outline.get("course", {})))
+                
+                # Send the request to the API - use higher max_tokens for content generation
+                pending = []
+                pending_chars = 0
+                # The subunit only shows as in-progress once its request is actually in flight
+                async for chunk in self.api_client.send_request_stream(
+                    prompt=prompt,
+                    temperature=0.7,
+                    max_tokens=12000,  # Allow for very detailed content
+                    on_start=lambda: self.progress.start_subunit_content(subunit_id)
+                ):
+                    content_parts.append(chunk)
+                    pending.append(chunk)
+                    pending_chars += len(chunk)
+                    if pending_chars >= STREAM_FLUSH_CHARS:
+                        await f.write("".join(pending))
+                        await f.flush()
+                        pending.clear()
+                        pending_chars = 0
+                await f.write("".join(pending))
+            os.replace(partial_path, filepath)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        content = "".join(content_parts)
         
         self.progress.log("info", f"Content saved to {filepath}", f"subunit-{subunit_id}")
         
@@ -604,81 +1093,130 @@ class CoursePipeline:
     async def run_pipeline(self) -> None:
         """Run the complete pipeline"""
         try:
-            # Step 1: Generate the course outline
-            self.outline = await self.generate_outline()
+            # Step 1: Generate the course outline, unless resuming from a saved one
+            if not (self.resume and await self.load_saved_state()):
+                self.outline = await self.generate_outline()
+            self.units_by_subunit_id = {
+                str(subunit.get("subunit_number")): (unit, subunit)
+                for unit in self.outline.get("units", [])
+                for subunit in unit.get("subunits", [])
+            }
             
-            # Step 2: Enhance the descriptions
-            self.enhanced_descriptions = await self.enhance_descriptions(self.outline)
+            # Steps 2 and 3: enhance descriptions unit by unit while parallel workers
+            # generate content for each unit as soon as its descriptions are ready
+            subunit_queue = asyncio.Queue()
+            # Build the shared prompt prefix before the workers start, so they don't all read it at once
+            await self.get_content_prompt_prefix()
+            content_task = asyncio.create_task(self.generate_all_content(subunit_queue))
+            try:
+                if self.enhanced_descriptions is not None:
+                    # Descriptions were restored from disk, so every subunit is ready now
+                    for unit in self.outline.get("units", []):
+                        for subunit in unit.get("subunits", []):
+                            await subunit_queue.put(subunit)
+                    self.progress.set_descriptions_complete(len(self.enhanced_descriptions))
+                else:
+                    await self.enhance_descriptions(self.outline, subunit_queue)
+            except Exception:
+                content_task.cancel()
+                raise
             
-            # Step 3: Generate content for each subunit in parallel
-            await self.generate_all_content()
+            # One sentinel per worker tells them no more subunits are coming
+            for _ in range(MAX_PARALLEL_REQUESTS):
+                subunit_queue.put_nowait(None)
+            await content_task
+            if self.checkpoint_task is not None:
+                await self.checkpoint_task
             
             # Save final progress
-            if self.course_folder:
-                progress_file = os.path.join(OUTPUT_DIR, self.course_folder, "progress_final.json")
-            else:
-                progress_file = os.path.join(OUTPUT_DIR, "progress_final.json")
-                
-            self.progress.save_progress(progress_file)
+            await self.progress.save_progress(self.progress_path("progress_final.json"))
             
             self.progress.log("success", "Course generation pipeline completed successfully", "pipeline")
         except Exception as e:
             self.progress.log("error", f"Pipeline failed: {str(e)}", "pipeline")
             raise
-        finally:
-            # Ensure API client is closed
-            await self.api_client.close()
-    
-    async def generate_all_content(self) -> None:
-        """Generate content for all subunits using parallel processing"""
-        # Collect all subunits from the outline
-        all_subunits = []
-        for unit in self.outline.get("units", []):
-            for subunit in unit.get("subunits", []):
-                all_subunits.append(subunit)
-        
-        # Sort by subunit number to ensure predictable processing order
-        all_subunits.sort(key=lambda x: float(x.get("subunit_number", 0)))
-        
-        # Create a semaphore to limit concurrent requests
-        semaphore = asyncio.Semaphore(PARALLEL_REQUESTS)
-        
-        async def process_with_semaphore(subunit):
-            async with semaphore:
+    
+    async def generate_all_content(self, subunit_queue: asyncio.Queue) -> None:
+        """Generate content for queued subunits using parallel workers"""
+        async def worker():
+            # Each worker stops when it takes a None sentinel from the queue
+            while True:
+                subunit = await subunit_queue.get()
+                if subunit is None:
+                    return
+                
+                # Skip subunits an earlier run already saved
+                subunit_id = str(subunit.get("subunit_number", "unknown"))
+                if self.resume and await self.is_subunit_generated(subunit_id):
+                    self.progress.log("info", "Content already generated, skipping", f"subunit-{subunit_id}")
+                    self.progress.complete_subunit_content(subunit_id)
+                    continue
+                
                 try:
-                    return await self.generate_subunit_content(
-                        self.outline, 
-                        self.enhanced_descriptions,
-                        subunit
-                    )
+                    await self.generate_subunit_content(subunit)
                 except Exception as e:
-                    subunit_id = str(subunit.get("subunit_number", "unknown"))
                     self.progress.error_in_subunit(subunit_id, str(e))
                     logger.error(f"Error generating content for subunit {subunit_id}: {e}")
-                    return None
-        
-        # Create tasks for all subunits
-        tasks = [process_with_semaphore(subunit) for subunit in all_subunits]
+                    continue
+                
+                # Periodically checkpoint so a crash mid-run doesn't lose progress
+                if self.progress.completed_count % PROGRESS_CHECKPOINT_INTERVAL == 0:
+                    self.schedule_checkpoint()
         
-        # Wait for all tasks to complete
-        await asyncio.gather(*tasks)
+        # Enough workers for the highest concurrency; the client's adaptive limiter
+        # decides how many of their requests are actually in flight
+        await asyncio.gather(*(worker() for _ in range(MAX_PARALLEL_REQUESTS)))
     
     def _extract_json(self, content: str) -> str:
         """Extract JSON from a string that might contain markdown or other text"""
         # Try to extract JSON from code blocks first
-        json_match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', content)
+        json_match = JSON_CODE_BLOCK_PATTERN.search(content)
         if json_match:
             return json_match.group(1).strip()
         
-        # If no code blocks, try to find JSON brackets
-        json_match = re.search(r'(\{[\s\S]*\}|\[[\s\S]*\])', content)
-        if json_match:
-            return json_match.group(1).strip()
+        # If no code blocks, take the first balanced JSON object or array
+        json_text = self._scan_json_brackets(content)
+        if json_text is not None:
+            return json_text
         
         # If all else fails, return the content as is
         return content.strip()
+    
+    @staticmethod
+    def _scan_json_brackets(content: str) -> Optional[str]:
+        """Find the first balanced JSON object or array with a single linear scan"""
+        starts = [i for i in (content.find("{"), content.find("[")) if i != -1]
+        if not starts:
+            return None
+        start = min(starts)
+        closer = "}" if content[start] == "{" else "]"
+        
+        depth = 0
+        in_string = False
+        escaped = False
+        for i in range(start, len(content)):
+            char = content[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "{[":
+                depth += 1
+            elif char in "}]":
+                depth -= 1
+                if depth == 0:
+                    return content[start:i + 1]
+        
+        # Unbalanced (e.g. truncated) output: fall back to the last closing bracket
+        end = content.rfind(closer)
+        return content[start:end + 1] if end > start else None
 
-async def main(course_title: str, course_description: str):
+async def main(course_title: str, course_description: str, resume: bool = False):
     """Main entry point for the script"""
     # Create necessary directories
     os.makedirs(PROMPTS_DIR, exist_ok=True)
@@ -703,29 +1241,30 @@ async def main(course_title: str, course_description: str):
         logger.error(f"API key not found. Please set the {API_KEY_ENV_VAR} environment variable.")
         return
     
-    # Create and run the pipeline
-    pipeline = CoursePipeline(api_key, course_title, course_description)
-    
-    start_time = time.time()
-    logger.info(f"Starting course generation pipeline for '{course_title}'")
-    
-    try:
-        await pipeline.run_pipeline()
+    # Create and run the pipeline; leaving the block closes its API session
+    async with CoursePipeline(api_key, course_title, course_description, resume=resume) as pipeline:
+        start_time = time.time()
+        logger.info(f"Starting course generation pipeline for '{course_title}'")
         
-        # Log completion stats
-        duration = (time.time() - start_time) / 60
-        logger.info(f"Pipeline completed in {duration:.1f} minutes")
-    except Exception as e:
-        logger.error(f"Pipeline failed: {e}")
-        # Save progress even on failure
-        pipeline.progress.save_progress(os.path.join(OUTPUT_DIR, "progress_error.json"))
+        try:
+            await pipeline.run_pipeline()
+            
+            # Log completion stats
+            duration = (time.time() - start_time) / 60
+            logger.info(f"Pipeline completed in {duration:.1f} minutes")
+        except Exception as e:
+            logger.error(f"Pipeline failed: {e}")
+            # Save progress even on failure
+            await pipeline.progress.save_progress(os.path.join(OUTPUT_DIR, "progress_error.json"))
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate a course using the Perplexity API")
     parser.add_argument("--title", required=True, help="The title of the course")
     parser.add_argument("--description", required=True, help="Description of the course")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the latest run for this title, reusing its saved outline, descriptions and content")
     
     args = parser.parse_args()
     
     # Run the async main function
-    asyncio.run(main(args.title, args.description))
\ No newline at end of file
+    asyncio.run(main(args.title, args.description, args.resume))
\ No newline at end of file
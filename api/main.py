@@ -10,22 +10,30 @@ This API serves as the backend for the CourseGPT frontend application.
 
 import os
 import re
-import json
 import yaml
+import orjson
 import sys
+import time
 import asyncio
 import threading
 from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, ORJSONResponse
 from pydantic import BaseModel
-from dotenv import load_dotenv, find_dotenv
-
-# Load environment variables
-load_dotenv(find_dotenv())
 
+# Prefer the libyaml-backed loader for frontmatter when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as YAMLLoader
+except ImportError:
+    from yaml import SafeLoader as YAMLLoader
 
+# Environment variables are loaded from .env by the genai module on import
 try:
     from genai import (
         CoursePipeline, 
@@ -45,11 +53,58 @@ except ImportError as e:
 
 
 API_OUTPUT_DIR = OUTPUT_DIR
+COURSES_CACHE_TTL = 2.0  # Seconds a scanned course list is reused before rescanning
+COURSE_SCAN_WORKERS = 16  # Threads used to read course folders in parallel when listing
+
+# Cache for the aggregated course list, keyed on the output directory mtime
+_courses_cache: Dict[str, Any] = {"mtime_ns": None, "expires_at": 0.0, "courses": None}
+_courses_cache_lock = threading.Lock()
+_course_scan_executor = ThreadPoolExecutor(max_workers=COURSE_SCAN_WORKERS, thread_name_prefix="course-scan")
+
+# Patterns used on every request, compiled once at import
+TIMESTAMP_PATTERN = re.compile(r'(\d{8}-\d{6})')
+UNIT_PATTERN = re.compile(r'unit(\d+)')
+SUBUNIT_PATTERN = re.compile(r'subunit(\d+\.\d+)')
+FRONTMATTER_PATTERN = re.compile(r'^---\n(.*?)\n---\n(.*)', re.DOTALL)
+UNSAFE_FILENAME_CHARS_PATTERN = re.compile(r'[^\w\-\.]')
+SUBUNIT_FILENAME_PATTERN = re.compile(r'subunit[^/\\]*\.md')
+
+FRONTMATTER_READ_SIZE = 8192  # Bytes read up front when only the frontmatter is needed
+COURSE_GENERATION_WORKERS = 2  # Number of courses generated concurrently
+
+async def course_generation_worker(queue: asyncio.Queue) -> None:
+    """Generate queued courses on the server's event loop"""
+    while True:
+        title, description = await queue.get()
+        try:
+            await generate_course(title, description)
+        except Exception as e:
+            print(f"Course generation failed for '{title}': {e}")
+        finally:
+            queue.task_done()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the course generation workers for the lifetime of the server"""
+    app.state.course_queue = asyncio.Queue()
+    workers = []
+    if pipeline_available:
+        workers = [
+            asyncio.create_task(course_generation_worker(app.state.course_queue))
+            for _ in range(COURSE_GENERATION_WORKERS)
+        ]
+    
+    yield
+    
+    for worker in workers:
+        worker.cancel()
 
 app = FastAPI(
     title="CourseGPT API",
     description="API for accessing CourseGPT course content",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Add CORS middleware to allow frontend to make requests
@@ -92,6 +147,7 @@ class Subunit(BaseModel):
     file: str
     learning_objectives: Optional[List[str]] = None
     key_topics: Optional[List[str]] = None
+    frontmatter: Optional[Dict[str, Any]] = None
 
 class Frontmatter(BaseModel):
     title: str
@@ -115,36 +171,60 @@ class CourseCreateRequest(BaseModel):
 # Helper functions
 def extract_timestamp_from_folder(folder_name: str) -> Optional[str]:
     """Extract timestamp from folder name in the format YYYYMMDD-HHMMSS"""
-    timestamp_match = re.search(r'(\d{8}-\d{6})', folder_name)
+    timestamp_match = TIMESTAMP_PATTERN.search(folder_name)
     if timestamp_match:
         timestamp_str = timestamp_match.group(1)
         try:
-            timestamp = datetime.strptime(timestamp_str, "%Y%m%d-%H%M%S")
+            # Build from the fixed-width digits directly; cheaper than strptime and still validated
+            timestamp = datetime(
+                int(timestamp_str[0:4]), int(timestamp_str[4:6]), int(timestamp_str[6:8]),
+                int(timestamp_str[9:11]), int(timestamp_str[11:13]), int(timestamp_str[13:15])
+            )
             return timestamp.isoformat()
         except ValueError:
             return None
     return None
 
-def is_course_complete(course_folder: str) -> bool:
+@lru_cache(maxsize=256)
+def load_json_cached(path: str, mtime_ns: int) -> Any:
+    """Parse a JSON file, keyed on its mtime so a rewritten file is parsed again"""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+def load_json_file(path: str) -> Any:
+    """Load a JSON file, reusing the parsed result while the file is unchanged.
+
+    The returned data is shared between callers and must not be mutated.
+    """
+    return load_json_cached(path, os.stat(path).st_mtime_ns)
+
+def list_course_files(course_path: str) -> set:
+    """List the names of the files in a course folder with a single directory scan"""
+    try:
+        with os.scandir(course_path) as it:
+            return {entry.name for entry in it if entry.is_file()}
+    except OSError:
+        return set()
+
+def is_course_complete(course_files: set) -> bool:
     """Check if a course is complete by looking for progress_final.json"""
-    progress_final_path = os.path.join(API_OUTPUT_DIR, course_folder, "progress_final.json")
-    return os.path.exists(progress_final_path)
+    return "progress_final.json" in course_files
 
-def is_course_in_progress(course_folder: str) -> bool:
+def is_course_in_progress(course_files: set) -> bool:
     """Check if a course is in progress"""
     # First check if there's a progress.json file
-    progress_path = os.path.join(API_OUTPUT_DIR, course_folder, "progress.json")
-    if os.path.exists(progress_path):
+    if "progress.json" in course_files:
         return True
     
     # If no progress.json, check if there's an outline but not marked as complete
-    outline_path = os.path.join(API_OUTPUT_DIR, course_folder, "course_outline.json")
-    return os.path.exists(outline_path) and not is_course_complete(course_folder)
+    return "course_outline.json" in course_files and not is_course_complete(course_files)
 
 def get_course_info(course_folder: str) -> Dict[str, Any]:
     """Get course information from course_outline.json or progress.json"""
-    outline_path = os.path.join(API_OUTPUT_DIR, course_folder, "course_outline.json")
-    progress_path = os.path.join(API_OUTPUT_DIR, course_folder, "progress.json")
+    # Join the folder path once; file paths are only built for files that get read
+    course_path = os.path.join(API_OUTPUT_DIR, course_folder)
+    course_files = list_course_files(course_path)
+    has_outline = "course_outline.json" in course_files
     
     # Initialize default course info
     course_info = {
@@ -152,78 +232,135 @@ def get_course_info(course_folder: str) -> Dict[str, Any]:
         "description": "",
         "folder": course_folder,
         "timestamp": extract_timestamp_from_folder(course_folder),
-        "complete": is_course_complete(course_folder),
-        "in_progress": is_course_in_progress(course_folder),
+        "complete": is_course_complete(course_files),
+        "in_progress": is_course_in_progress(course_files),
         "initializing": False
     }
     
     # Try to read course information from course_outline.json
-    if os.path.exists(outline_path):
+    if has_outline:
         try:
-            with open(outline_path, 'r') as f:
-                data = json.load(f)
-                if "course" in data:
-                    course_info["title"] = data["course"].get("title", course_folder)
-                    course_info["description"] = data["course"].get("description", "")
-                    course_info["difficulty_level"] = data["course"].get("difficulty_level", "")
-                    course_info["estimated_duration"] = data["course"].get("estimated_duration", "")
-        except json.JSONDecodeError:
+            data = load_json_file(os.path.join(course_path, "course_outline.json"))
+            if "course" in data:
+                course_info["title"] = data["course"].get("title", course_folder)
+                course_info["description"] = data["course"].get("description", "")
+                course_info["difficulty_level"] = data["course"].get("difficulty_level", "")
+                course_info["estimated_duration"] = data["course"].get("estimated_duration", "")
+        except orjson.JSONDecodeError:
             pass
     
     # If we're still initializing (no outline yet), try to get title from progress.json
-    if not os.path.exists(outline_path) and os.path.exists(progress_path):
+    if not has_outline and "progress.json" in course_files:
         try:
-            with open(progress_path, 'r') as f:
-                progress_data = json.load(f)
-                if "summary" in progress_data:
-                    summary = progress_data["summary"]
-                    if "course_title" in summary:
-                        course_info["title"] = summary["course_title"]
-                    if "description" in summary:
-                        course_info["description"] = summary["description"]
+            progress_data = load_json_file(os.path.join(course_path, "progress.json"))
+            if "summary" in progress_data:
+                summary = progress_data["summary"]
+                if "course_title" in summary:
+                    course_info["title"] = summary["course_title"]
+                if "description" in summary:
+                    course_info["description"] = summary["description"]
+                
+                # Check status
+                if summary.get("status") == "initializing":
+                    course_info["initializing"] = True
+                elif summary.get("status") in ["enhancing-descriptions", "generating-content"]:
+                    course_info["in_progress"] = True
                     
-                    # Check status
-                    if summary.get("status") == "initializing":
-                        course_info["initializing"] = True
-                    elif summary.get("status") in ["enhancing-descriptions", "generating-content"]:
-                        course_info["in_progress"] = True
-                        
-                    # Get progress percentage
-                    if "progress_percentage" in summary:
-                        course_info["progress_percentage"] = summary["progress_percentage"]
-        except json.JSONDecodeError:
+                # Get progress percentage
+                if "progress_percentage" in summary:
+                    course_info["progress_percentage"] = summary["progress_percentage"]
+        except orjson.JSONDecodeError:
             pass
     
     return course_info
 
+def read_file_bytes(path: str) -> bytes:
+    """Read a whole file with a single read sized by fstat, normalising CRLF line endings"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        return os.read(fd, os.fstat(fd).st_size).replace(b"\r\n", b"\n")
+    finally:
+        os.close(fd)
+
+def parse_frontmatter_text(frontmatter_text: str) -> Dict[str, Any]:
+    """Parse the YAML text between the frontmatter delimiters"""
+    try:
+        return yaml.load(frontmatter_text, Loader=YAMLLoader)
+    except yaml.YAMLError:
+        return {}
+
 def parse_markdown_frontmatter(content: str) -> tuple[Dict[str, Any], str]:
     """Parse frontmatter from markdown content"""
     frontmatter = {}
     main_content = content
     
-    frontmatter_match = re.match(r'^---\n(.*?)\n---\n(.*)', content, re.DOTALL)
+    frontmatter_match = FRONTMATTER_PATTERN.match(content)
     if frontmatter_match:
         frontmatter_text = frontmatter_match.group(1)
         main_content = frontmatter_match.group(2)
-        try:
-            frontmatter = yaml.safe_load(frontmatter_text)
-        except yaml.YAMLError:
-            pass
+        frontmatter = parse_frontmatter_text(frontmatter_text)
             
     return frontmatter, main_content
 
-# Function to run the course generation process in a background thread
-def run_course_generation_in_background(title: str, description: str) -> None:
-    """Run the course generation process as a background task"""
-    # Create an event loop for the background thread
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
+def read_markdown_frontmatter(path: str) -> Dict[str, Any]:
+    """Parse the frontmatter of a markdown file without reading its body.
+
+    Only the first FRONTMATTER_READ_SIZE bytes are read unless the closing
+    delimiter lies further into the file.
+    """
+    fd = os.open(path, os.O_RDONLY)
     try:
-        # Run the course generation function
-        loop.run_until_complete(generate_course(title, description))
+        size = os.fstat(fd).st_size
+        raw = os.read(fd, min(size, FRONTMATTER_READ_SIZE))
+        # Files written on Windows use CRLF; os.read does no newline translation
+        head = raw.replace(b"\r\n", b"\n")
+        if not head.startswith(b"---\n"):
+            return {}
+        
+        end = head.find(b"\n---\n", 3)
+        if end == -1 and len(raw) < size:
+            raw += os.read(fd, size - len(raw))
+            head = raw.replace(b"\r\n", b"\n")
+            end = head.find(b"\n---\n", 3)
     finally:
-        loop.close()
+        os.close(fd)
+    
+    if end == -1:
+        return {}
+    return parse_frontmatter_text(head[4:end].decode("utf-8"))
+
+def list_courses_cached() -> List[Dict[str, Any]]:
+    """Scan the output directory for courses, reusing the last scan for a short TTL"""
+    try:
+        mtime_ns = os.stat(API_OUTPUT_DIR).st_mtime_ns
+    except OSError:
+        return []
+    
+    with _courses_cache_lock:
+        now = time.monotonic()
+        if (_courses_cache["courses"] is not None
+                and _courses_cache["mtime_ns"] == mtime_ns
+                and now < _courses_cache["expires_at"]):
+            return _courses_cache["courses"]
+        
+        with os.scandir(API_OUTPUT_DIR) as it:
+            # Dot-folders such as the pipeline's .cache are not courses
+            course_folders = [entry.name for entry in it if not entry.name.startswith(".") and entry.is_dir()]
+        
+        # Read the course folders concurrently so their disk latency overlaps
+        courses = list(_course_scan_executor.map(get_course_info, course_folders))
+        
+        # Sort courses by timestamp (newest first) if available
+        # ISO timestamps sort chronologically as strings; folders without one map to "\uffff" and stay first
+        courses.sort(key=lambda x: x["timestamp"] or "\uffff", reverse=True)
+        
+        _courses_cache.update(mtime_ns=mtime_ns, expires_at=now + COURSES_CACHE_TTL, courses=courses)
+        return courses
+
+def invalidate_courses_cache() -> None:
+    """Drop the cached course list so the next request rescans the output directory"""
+    with _courses_cache_lock:
+        _courses_cache["courses"] = None
 
 # API Endpoints
 @app.get("/", tags=["Health"])
@@ -231,148 +368,143 @@ async def root():
     """Health check endpoint"""
     return {"status": "ok", "message": "CourseGPT API is running"}
 
-@app.get("/courses", response_model=List[Course], tags=["Courses"])
+# Listing endpoints build their payloads locally in the exact model shape, so they
+# skip response validation and only reference the models for the OpenAPI schema
+@app.get("/courses", response_model=None, responses={200: {"model": List[Course]}}, tags=["Courses"])
 async def get_courses():
     """Get list of all courses"""
-    courses = []
-    
-    if not os.path.exists(API_OUTPUT_DIR):
-        return courses
-        
-    for item in os.listdir(API_OUTPUT_DIR):
-        item_path = os.path.join(API_OUTPUT_DIR, item)
-        if os.path.isdir(item_path):
-            course_info = get_course_info(item)
-            courses.append(course_info)
-    
-    # Sort courses by timestamp (newest first) if available
-    courses.sort(
-        key=lambda x: (x["timestamp"] is None, x["timestamp"] if x["timestamp"] else ""),
-        reverse=True
-    )
-    
-    return courses
+    return await run_in_threadpool(list_courses_cached)
 
-@app.get("/courses/{course_folder}", response_model=Course, tags=["Courses"])
-async def get_course(course_folder: str):
-    """Get details for a specific course"""
+def read_course(course_folder: str) -> Dict[str, Any]:
+    """Read the details for a specific course from disk"""
     course_path = os.path.join(API_OUTPUT_DIR, course_folder)
     
-    if not os.path.exists(course_path) or not os.path.isdir(course_path):
+    if not os.path.isdir(course_path):
         raise HTTPException(status_code=404, detail=f"Course '{course_folder}' not found")
     
     course_info = get_course_info(course_folder)
     return course_info
 
-@app.get("/courses/{course_folder}/units", response_model=List[Unit], tags=["Units"])
-async def get_units(course_folder: str):
-    """Get all units for a specific course"""
+@app.get("/courses/{course_folder}", response_model=None, responses={200: {"model": Course}}, tags=["Courses"])
+async def get_course(course_folder: str):
+    """Get details for a specific course"""
+    return await run_in_threadpool(read_course, course_folder)
+
+def read_units(course_folder: str) -> List[Dict[str, Any]]:
+    """Read all units for a specific course from disk"""
     course_path = os.path.join(API_OUTPUT_DIR, course_folder)
     
-    if not os.path.exists(course_path) or not os.path.isdir(course_path):
+    if not os.path.isdir(course_path):
         raise HTTPException(status_code=404, detail=f"Course '{course_folder}' not found")
     
     units = []
-    unit_pattern = re.compile(r'unit(\d+)')
-    
-    for item in os.listdir(course_path):
-        item_path = os.path.join(course_path, item)
-        if os.path.isdir(item_path) and item.startswith("unit"):
-            # Extract unit number from folder name
-            unit_match = unit_pattern.search(item)
-            if unit_match:
-                unit_number = int(unit_match.group(1))
-                unit_title_part = item[len(f"unit{unit_number}-"):].replace("_", " ")
-                
-                # Get unit description from outline if available
-                unit_description = ""
-                outline_path = os.path.join(course_path, "course_outline.json")
-                if os.path.exists(outline_path):
-                    try:
-                        with open(outline_path, 'r') as f:
-                            data = json.load(f)
-                            for unit in data.get("units", []):
-                                if unit.get("unit_number") == unit_number:
-                                    unit_description = unit.get("unit_description", "")
-                                    break
-                    except json.JSONDecodeError:
-                        pass
-                
-                units.append({
-                    "unit_number": unit_number,
-                    "unit_title": unit_title_part,
-                    "unit_description": unit_description,
-                    "folder": item
-                })
+    
+    # Collect unit folders and check for the outline in a single directory scan.
+    # Filter on the name first; DirEntry.is_dir() is answered from the directory listing
+    unit_folders = []
+    has_outline = False
+    with os.scandir(course_path) as entries:
+        for entry in entries:
+            if entry.name == "course_outline.json":
+                has_outline = True
+            elif entry.name.startswith("unit") and entry.is_dir():
+                unit_folders.append(entry.name)
+    
+    # Index unit descriptions from the outline once for all unit folders
+    unit_descriptions = {}
+    if has_outline:
+        try:
+            data = load_json_file(os.path.join(course_path, "course_outline.json"))
+            unit_descriptions = {
+                unit.get("unit_number"): unit.get("unit_description", "")
+                for unit in data.get("units", [])
+            }
+        except orjson.JSONDecodeError:
+            pass
+    
+    for item in unit_folders:
+        # Extract unit number from folder name
+        unit_match = UNIT_PATTERN.search(item)
+        if unit_match:
+            unit_number = int(unit_match.group(1))
+            unit_title_part = item[len(f"unit{unit_number}-"):].replace("_", " ")
+            
+            units.append({
+                "unit_number": unit_number,
+                "unit_title": unit_title_part,
+                "unit_description": unit_descriptions.get(unit_number, ""),
+                "folder": item
+            })
     
     # Sort units by number
     units.sort(key=lambda x: x["unit_number"])
     return units
 
-@app.get("/courses/{course_folder}/units/{unit_folder}", response_model=List[Subunit], tags=["Subunits"])
-async def get_subunits(course_folder: str, unit_folder: str):
-    """Get all subunits for a specific unit"""
+@app.get("/courses/{course_folder}/units", response_model=None, responses={200: {"model": List[Unit]}}, tags=["Units"])
+async def get_units(course_folder: str):
+    """Get all units for a specific course"""
+    return await run_in_threadpool(read_units, course_folder)
+
+def read_subunits(course_folder: str, unit_folder: str) -> List[Dict[str, Any]]:
+    """Read all subunits for a specific unit from disk"""
     unit_path = os.path.join(API_OUTPUT_DIR, course_folder, unit_folder)
     
-    if not os.path.exists(unit_path) or not os.path.isdir(unit_path):
+    if not os.path.isdir(unit_path):
         raise HTTPException(status_code=404, detail=f"Unit '{unit_folder}' not found in course '{course_folder}'")
     
     subunits = []
     
-    for item in os.listdir(unit_path):
-        item_path = os.path.join(unit_path, item)
-        if os.path.isfile(item_path) and item.startswith("subunit") and item.endswith(".md"):
-            # Read the file to extract frontmatter
-            with open(item_path, 'r') as f:
-                content = f.read()
-                
-            # Parse frontmatter
-            frontmatter, _ = parse_markdown_frontmatter(content)
-            
-            # Create subunit info
-            subunit_info = {
-                "subunit_title": frontmatter.get("title", item),
-                "subunit_number": 0,
-                "file": item,
-                "learning_objectives": frontmatter.get("learning_objectives", []),
-                "key_topics": frontmatter.get("key_topics", [])
-            }
-            
-            # Get subunit number from frontmatter or filename
-            if "subunit_number" in frontmatter:
-                try:
-                    subunit_info["subunit_number"] = float(frontmatter["subunit_number"])
-                except ValueError:
-                    # Extract from filename as fallback
-                    subunit_match = re.search(r'subunit(\d+\.\d+)', item)
-                    if subunit_match:
-                        subunit_info["subunit_number"] = float(subunit_match.group(1))
-            else:
-                # Extract from filename
-                subunit_match = re.search(r'subunit(\d+\.\d+)', item)
-                if subunit_match:
-                    subunit_info["subunit_number"] = float(subunit_match.group(1))
-            
-            subunits.append(subunit_info)
+    with os.scandir(unit_path) as entries:
+        subunit_files = [
+            entry for entry in entries
+            if entry.name.startswith("subunit") and entry.name.endswith(".md") and entry.is_file()
+        ]
+    
+    for entry in subunit_files:
+        item = entry.name
+        item_path = entry.path
+        
+        # Read only the frontmatter block, the body is not needed here
+        frontmatter = read_markdown_frontmatter(item_path)
+        
+        # Get subunit number from frontmatter, falling back to the filename
+        try:
+            subunit_number = float(frontmatter.get("subunit_number"))
+        except (TypeError, ValueError):
+            subunit_match = SUBUNIT_PATTERN.search(item)
+            subunit_number = float(subunit_match.group(1)) if subunit_match else 0.0
+        
+        subunits.append({
+            "subunit_title": frontmatter.get("title", item),
+            "subunit_number": subunit_number,
+            "file": item,
+            "learning_objectives": frontmatter.get("learning_objectives", []),
+            "key_topics": frontmatter.get("key_topics", []),
+            # Lets clients pair the listing with the raw markdown endpoint
+            "frontmatter": frontmatter
+        })
     
     # Sort subunits by number
     subunits.sort(key=lambda x: x["subunit_number"])
     return subunits
 
-@app.get("/courses/{course_folder}/units/{unit_folder}/subunits/{subunit_file}", response_model=CourseContent, tags=["Content"])
-async def get_subunit_content(course_folder: str, unit_folder: str, subunit_file: str):
-    """Get content for a specific subunit"""
+@app.get("/courses/{course_folder}/units/{unit_folder}", response_model=None, responses={200: {"model": List[Subunit]}}, tags=["Subunits"])
+async def get_subunits(course_folder: str, unit_folder: str):
+    """Get all subunits for a specific unit"""
+    return await run_in_threadpool(read_subunits, course_folder, unit_folder)
+
+def read_subunit_content(course_folder: str, unit_folder: str, subunit_file: str) -> Dict[str, Any]:
+    """Read the content for a specific subunit from disk"""
     subunit_path = os.path.join(API_OUTPUT_DIR, course_folder, unit_folder, subunit_file)
     
-    if not os.path.exists(subunit_path) or not os.path.isfile(subunit_path):
+    if not os.path.isfile(subunit_path):
         raise HTTPException(
             status_code=404, 
             detail=f"Subunit '{subunit_file}' not found in unit '{unit_folder}' of course '{course_folder}'"
         )
     
     # Read subunit content
-    with open(subunit_path, 'r') as f:
-        content = f.read()
+    content = read_file_bytes(subunit_path).decode("utf-8")
     
     # Parse frontmatter and content
     frontmatter, main_content = parse_markdown_frontmatter(content)
@@ -383,14 +515,47 @@ async def get_subunit_content(course_folder: str, unit_folder: str, subunit_file
         "content": main_content
     }
 
-# Add POST endpoint for course creation with background task
-@app.post("/courses/create", response_model=Course, tags=["Courses"])
-async def create_course(request: CourseCreateRequest, background_tasks: BackgroundTasks):
+@app.get("/courses/{course_folder}/units/{unit_folder}/subunits/{subunit_file}", response_model=CourseContent, tags=["Content"])
+async def get_subunit_content(course_folder: str, unit_folder: str, subunit_file: str):
+    """Get content for a specific subunit"""
+    return await run_in_threadpool(read_subunit_content, course_folder, unit_folder, subunit_file)
+
+@app.get("/courses/{course_folder}/units/{unit_folder}/subunits/{subunit_file}/raw", response_class=FileResponse, tags=["Content"])
+async def get_subunit_raw(course_folder: str, unit_folder: str, subunit_file: str):
+    """Stream the raw markdown file for a subunit, frontmatter included"""
+    not_found = HTTPException(
+        status_code=404, 
+        detail=f"Subunit '{subunit_file}' not found in unit '{unit_folder}' of course '{course_folder}'"
+    )
+    
+    # Only serve subunit markdown files from inside the output directory
+    for folder in (course_folder, unit_folder):
+        if folder in ("", ".", "..") or "/" in folder or "\\" in folder:
+            raise not_found
+    if not SUBUNIT_FILENAME_PATTERN.fullmatch(subunit_file):
+        raise not_found
+    
+    subunit_path = os.path.join(API_OUTPUT_DIR, course_folder, unit_folder, subunit_file)
+    output_root = os.path.realpath(API_OUTPUT_DIR)
+    if os.path.commonpath([output_root, os.path.realpath(subunit_path)]) != output_root:
+        raise not_found
+    
+    if not await run_in_threadpool(os.path.isfile, subunit_path):
+        raise not_found
+    
+    # The file is sent in chunks straight from disk instead of being decoded and JSON-encoded
+    return FileResponse(subunit_path, media_type="text/markdown")
+
+# Add POST endpoint for course creation with queued generation
+@app.post("/courses/create", response_model=None, responses={200: {"model": Course}}, tags=["Courses"])
+async def create_course(request: CourseCreateRequest):
     """Create a new course and start generation in the background"""
     
     # Create a timestamp for the folder name
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-    safe_folder_name = re.sub(r'[^\w\-\.]', '_', request.title)
+    now = datetime.now()
+    now_iso = now.isoformat()
+    timestamp = now.strftime("%Y%m%d-%H%M%S")
+    safe_folder_name = UNSAFE_FILENAME_CHARS_PATTERN.sub('_', request.title)
     if len(safe_folder_name) > 50:
         safe_folder_name = safe_folder_name[:50]
     folder_name = f"{safe_folder_name}-{timestamp}"
@@ -404,7 +569,7 @@ async def create_course(request: CourseCreateRequest, background_tasks: Backgrou
         "summary": {
             "course_title": request.title,
             "status": "initializing",
-            "start_time": datetime.now().isoformat(),
+            "start_time": now_iso,
             "duration_minutes": 0,
             "outline_status": "pending",
             "description_status": "pending",
@@ -416,7 +581,7 @@ async def create_course(request: CourseCreateRequest, background_tasks: Backgrou
         "content_status": {},
         "errors": {},
         "logs": [{
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now_iso,
             "level": "info",
             "message": "Course generation initiated",
             "component": "api",
@@ -424,18 +589,16 @@ async def create_course(request: CourseCreateRequest, background_tasks: Backgrou
         }]
     }
     
-    with open(os.path.join(folder_path, "progress.json"), 'w') as f:
-        json.dump(initial_progress, f, indent=2)
+    with open(os.path.join(folder_path, "progress.json"), 'wb') as f:
+        f.write(orjson.dumps(initial_progress, option=orjson.OPT_INDENT_2))
+    
+    # Make the new course visible on the next listing
+    invalidate_courses_cache()
     
     # Check if pipeline is available
     if pipeline_available:
-        # Start the course generation in a background thread
-        background_tasks.add_task(
-            lambda: threading.Thread(
-                target=run_course_generation_in_background,
-                args=(request.title, request.description)
-            ).start()
-        )
+        # Hand the course to the generation workers
+        await app.state.course_queue.put((request.title, request.description))
     else:
         # Log that the pipeline is not available
         print(f"Course generation pipeline is not available. Course '{request.title}' created but content generation skipped.")
@@ -1,4 +1,4 @@
-import { Course, Unit, Subunit, CourseContent } from '../types/course';
+import { Course, Unit, Subunit, CourseContent, Frontmatter } from '../types/course';
 
 // Set base URL for API requests
 export const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
@@ -79,8 +79,23 @@ export const fetchSubunits = async (courseFolder: string, unitFolder: string): P
   }
 };
 
+/**
+ * Strip the frontmatter block from raw subunit markdown
+ */
+const stripFrontmatter = (markdown: string): string => {
+  const text = markdown.replace(/\r\n/g, '\n');
+  if (!text.startsWith('---\n')) {
+    return text;
+  }
+  const end = text.indexOf('\n---\n', 3);
+  return end === -1 ? text : text.slice(end + 5);
+};
+
 /**
  * Fetch content for a specific subunit
+ *
+ * The markdown comes from the raw endpoint, which streams the file as is, and the
+ * frontmatter from the unit's subunit listing.
  */
 export const fetchSubunitContent = async (
   courseFolder: string, 
@@ -88,16 +103,28 @@ export const fetchSubunitContent = async (
   subunitFile: string
 ): Promise<CourseContent> => {
   try {
-    const response = await fetch(
-      `${API_BASE_URL}/courses/${courseFolder}/units/${unitFolder}/subunits/${subunitFile}`
-    );
+    const [response, subunits] = await Promise.all([
+      fetch(`${API_BASE_URL}/courses/${courseFolder}/units/${unitFolder}/subunits/${subunitFile}/raw`),
+      fetchSubunits(courseFolder, unitFolder)
+    ]);
     
     if (!response.ok) {
       throw new Error(`Error fetching content: ${response.status}`);
     }
     
-    const data = await response.json();
-    return data;
+    const markdown = await response.text();
+    const subunit = subunits.find(s => s.file === subunitFile);
+    const frontmatter: Frontmatter = subunit?.frontmatter ?? {
+      title: subunit?.subunit_title ?? subunitFile,
+      unit: '',
+      unit_number: '',
+      subunit_number: subunit?.subunit_number ?? 0,
+      course: '',
+      learning_objectives: subunit?.learning_objectives,
+      key_topics: subunit?.key_topics
+    };
+    
+    return { frontmatter, content: stripFrontmatter(markdown) };
   } catch (error) {
     console.error(`Failed to fetch content for subunit "${subunitFile}":`, error);
     throw error;
@@ -23,6 +23,7 @@ export interface Subunit {
   file: string;
   learning_objectives?: string[];
   key_topics?: string[];
+  frontmatter?: Frontmatter;
 }
 
 export interface Frontmatter {
@@ -10,7 +10,7 @@ A Streamlit application to view and create course content. This app:
 """
 
 import os
-import json
+import orjson
 import streamlit as st
 import re
 import sys
@@ -19,7 +19,15 @@ import asyncio
 from datetime import datetime
 import yaml
 import subprocess
+import shutil
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# Prefer the libyaml-backed loader for frontmatter when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as YAMLLoader
+except ImportError:
+    from yaml import SafeLoader as YAMLLoader
 
 # Import the CoursePipeline from main.py
 sys.path.append(".")
@@ -31,6 +39,39 @@ except ImportError:
     OUTPUT_DIR = "output"
     API_KEY_ENV_VAR = "PERPLEXITY_API_KEY"
 
+# Patterns for course folder, unit folder and subunit file names, compiled once
+TIMESTAMP_PATTERN = re.compile(r'(\d{8}-\d{6})')
+UNIT_PATTERN = re.compile(r'unit(\d+)')
+SUBUNIT_PATTERN = re.compile(r'subunit(\d+\.\d+)')
+UNSAFE_FILENAME_CHARS_PATTERN = re.compile(r'[^\w\-\.]')
+
+FRONTMATTER_READ_SIZE = 8192  # Bytes read to find a subunit's frontmatter
+COURSE_SCAN_WORKERS = 16  # Threads used to read course folders in parallel when listing
+# The interpreter running this app, which has the pipeline's dependencies installed
+PYTHON_CMD = sys.executable or shutil.which("python3") or shutil.which("python") or "python"
+PROMPT_FILES = [
+    "course-outline-prompt.md",
+    "description-enhancement-prompt.md",
+    "subunit-content-generation-prompt.md"
+]
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def find_missing_prompt_files(prompts_dir, mtime_ns):
+    """List the required prompt files that are missing from the prompts directory"""
+    return [f for f in PROMPT_FILES if not os.path.exists(os.path.join(prompts_dir, f))]
+
+
+def write_json_atomic(path, data):
+    """Write JSON through a temp file renamed into place, so readers never see a partial file"""
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+
 
 class CourseCreator:
     """Class for creating new courses through Streamlit UI"""
@@ -44,15 +85,13 @@ class CourseCreator:
         requirements_met = True
         messages = []
         
-        # Check if prompt files exist
-        prompt_files = [
-            "course-outline-prompt.md",
-            "description-enhancement-prompt.md",
-            "subunit-content-generation-prompt.md"
-        ]
-        
-        os.makedirs(PROMPTS_DIR, exist_ok=True)
-        missing_files = [f for f in prompt_files if not os.path.exists(os.path.join(PROMPTS_DIR, f))]
+        # Check if prompt files exist, re-checking only when the prompts directory changes
+        try:
+            prompts_mtime = os.stat(PROMPTS_DIR).st_mtime_ns
+        except FileNotFoundError:
+            os.makedirs(PROMPTS_DIR, exist_ok=True)
+            prompts_mtime = os.stat(PROMPTS_DIR).st_mtime_ns
+        missing_files = find_missing_prompt_files(PROMPTS_DIR, prompts_mtime)
         if missing_files:
             requirements_met = False
             messages.append(f"❌ Missing prompt files: {', '.join(missing_files)}")
@@ -69,7 +108,8 @@ class CourseCreator:
             messages.append("✅ API key found")
         
         # Check output directory
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
+        if not os.path.isdir(OUTPUT_DIR):
+            os.makedirs(OUTPUT_DIR, exist_ok=True)
         messages.append(f"✅ Output directory available at {OUTPUT_DIR}")
         
         return requirements_met, messages
@@ -141,13 +181,9 @@ class CourseCreator:
     
     def start_course_generation(self, course_title, course_description):
         """Start course generation in the background using a subprocess"""
-        # Sanitize inputs to prevent shell injection
-        safe_title = course_title.replace('"', '\\"')
-        safe_desc = course_description.replace('"', '\\"')
-        
         # Create a timestamp for the folder name
         timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        safe_folder_name = re.sub(r'[^\w\-\.]', '_', safe_title)
+        safe_folder_name = UNSAFE_FILENAME_CHARS_PATTERN.sub('_', course_title)
         if len(safe_folder_name) > 50:
             safe_folder_name = safe_folder_name[:50]
         folder_name = f"{safe_folder_name}-{timestamp}"
@@ -181,38 +217,17 @@ class CourseCreator:
             }]
         }
         
-        with open(os.path.join(folder_path, "progress.json"), 'w') as f:
-            json.dump(initial_progress, f, indent=2)
-        
-        # Determine the correct Python command to use
-        python_cmd = "python"
-        try:
-            # Try to check if we're on Linux/Unix systems where python3 is common
-            if os.name == "posix":
-                # Check if python3 exists and is executable
-                try:
-                    python3_check = subprocess.run(
-                        ["which", "python3"], 
-                        capture_output=True, 
-                        text=True, 
-                        check=False
-                    )
-                    if python3_check.returncode == 0:
-                        python_cmd = "python3"
-                except Exception:
-                    # If the above check fails, try the platform module
-                    import platform
-                    if platform.system() == "Linux":
-                        python_cmd = "python3"
-        except Exception as e:
-            print(f"Error detecting Python command: {e}")
+        write_json_atomic(os.path.join(folder_path, "progress.json"), initial_progress)
         
-        # Build the command to run main.py in the background
-        cmd = f'nohup {python_cmd} main.py --title "{safe_title}" --description "{safe_desc}" > course_generation.log 2>&1 &'
+        # Build the command to run main.py in the background. Arguments are passed
+        # straight to the interpreter, so no shell quoting is needed
+        cmd = [PYTHON_CMD, "main.py", "--title", course_title, "--description", course_description]
         
-        # Execute the command
+        # Execute the command in its own session so it outlives the app, logging to a file
         try:
-            subprocess.Popen(cmd, shell=True, start_new_session=True)
+            with open("course_generation.log", 'ab') as log_file:
+                subprocess.Popen(cmd, stdout=log_file, stderr=subprocess.STDOUT,
+                                 stdin=subprocess.DEVNULL, start_new_session=True)
             st.session_state.last_generation_started = datetime.now().isoformat()
             print(f"Started course generation: {cmd}")
         except Exception as e:
@@ -220,8 +235,209 @@ class CourseCreator:
             # Add the error to the progress file
             initial_progress["errors"]["startup"] = str(e)
             initial_progress["summary"]["status"] = "error"
-            with open(os.path.join(folder_path, "progress.json"), 'w') as f:
-                json.dump(initial_progress, f, indent=2)
+            write_json_atomic(os.path.join(folder_path, "progress.json"), initial_progress)
+
+
+def split_frontmatter(content):
+    """Split markdown into its frontmatter text and body, or (None, content) without frontmatter"""
+    # Only the frontmatter is searched for the closing delimiter, never the whole body
+    if not content.startswith("---\n"):
+        return None, content
+    end = content.find("\n---\n", 4)
+    if end == -1:
+        return None, content
+    return content[4:end], content[end + 5:]
+
+
+# Parsed files are cached on (path, mtime_ns), so a file is re-read only after it changes
+@st.cache_data(max_entries=256, show_spinner=False)
+def load_outline(path, mtime_ns):
+    """Load a course_outline.json file"""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+@st.cache_data(max_entries=1024, show_spinner=False)
+def read_subunit_summary(path, mtime_ns):
+    """Get the title and number of a subunit from its frontmatter"""
+    item = os.path.basename(path)
+    with open(path, 'rb') as f:
+        # Listings only need the frontmatter, so the body is read only if the
+        # closing delimiter isn't within the head of the file
+        head = f.read(FRONTMATTER_READ_SIZE).replace(b"\r\n", b"\n")
+        if head.startswith(b"---\n") and head.find(b"\n---\n", 4) == -1:
+            f.seek(0)
+            head = f.read().replace(b"\r\n", b"\n")
+        
+    # Parse frontmatter, decoding only its bytes and never the body
+    subunit_info = {"title": item, "number": 0}
+    end = head.find(b"\n---\n", 4) if head.startswith(b"---\n") else -1
+    if end != -1:
+        try:
+            frontmatter = yaml.load(head[4:end].decode("utf-8"), Loader=YAMLLoader)
+            subunit_info["title"] = frontmatter.get("title", item)
+            subunit_info["number"] = float(frontmatter.get("subunit_number", 0))
+        except (yaml.YAMLError, ValueError):
+            # If decoding or parsing fails, extract subunit number from filename
+            subunit_match = SUBUNIT_PATTERN.search(item)
+            if subunit_match:
+                subunit_info["number"] = float(subunit_match.group(1))
+    
+    return subunit_info
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def read_subunit_file(path, mtime_ns):
+    """Read a subunit file and split its frontmatter from its content"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+        
+    # Parse frontmatter and content
+    frontmatter = {}
+    main_content = content
+    
+    frontmatter_text, body = split_frontmatter(content)
+    if frontmatter_text is not None:
+        main_content = body
+        try:
+            frontmatter = yaml.load(frontmatter_text, Loader=YAMLLoader)
+        except yaml.YAMLError:
+            pass
+            
+    return frontmatter, main_content
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def list_course_units(folder_path, mtime_ns):
+    """List the units in a course folder, sorted by number"""
+    units = []
+    
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.name.startswith("unit") and entry.is_dir():
+                # Extract unit number from folder name
+                item = entry.name
+                unit_match = UNIT_PATTERN.search(item)
+                if unit_match:
+                    unit_number = int(unit_match.group(1))
+                    unit_title = item[len(f"unit{unit_number}-"):].replace("_", " ")
+                    units.append({
+                        "number": unit_number,
+                        "title": unit_title,
+                        "folder": item
+                    })
+    
+    # Sort units by number
+    units.sort(key=lambda x: x["number"])
+    return units
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def list_unit_subunits(folder_path, mtime_ns):
+    """
+    List the subunits in a unit folder, sorted by number
+    
+    The folder's mtime changes whenever a subunit file is added, which the
+    pipeline does by renaming each finished file into place.
+    """
+    subunits = []
+    
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            # Match on the name before the file type check, which may need a stat
+            if entry.name.startswith("subunit") and entry.name.endswith(".md") and entry.is_file():
+                # Extract subunit information from frontmatter
+                subunit_info = read_subunit_summary(entry.path, entry.stat().st_mtime_ns)
+                subunit_info["file"] = entry.name
+                subunits.append(subunit_info)
+    
+    # Sort subunits by number
+    subunits.sort(key=lambda x: x["number"])
+    return subunits
+
+
+@st.cache_resource
+def get_course_scan_executor():
+    """Get the thread pool shared by all sessions for reading course folders"""
+    return ThreadPoolExecutor(max_workers=COURSE_SCAN_WORKERS, thread_name_prefix="course-scan")
+
+
+def read_course_info(output_dir, item):
+    """Read the course info for one course folder, or None if it has disappeared"""
+    item_path = os.path.join(output_dir, item)
+    
+    # Extract timestamp from folder name
+    timestamp_match = TIMESTAMP_PATTERN.search(item)
+    timestamp = None
+    if timestamp_match:
+        timestamp_str = timestamp_match.group(1)
+        try:
+            timestamp = datetime.strptime(timestamp_str, "%Y%m%d-%H%M%S")
+        except ValueError:
+            pass
+    
+    # One scan of the course folder answers every file-exists check below
+    try:
+        with os.scandir(item_path) as folder_entries:
+            names = {folder_entry.name for folder_entry in folder_entries}
+    except FileNotFoundError:
+        return None  # Removed since the output directory was scanned
+    has_outline = "course_outline.json" in names
+    has_progress_file = "progress.json" in names
+    
+    # Initialize default course info
+    course_info = {"title": item, "description": "", "timestamp": timestamp}
+    
+    # Try to read course information from course_outline.json
+    if has_outline:
+        try:
+            outline_path = os.path.join(item_path, "course_outline.json")
+            data = load_outline(outline_path, os.stat(outline_path).st_mtime_ns)
+            if "course" in data:
+                course_info["title"] = data["course"].get("title", item)
+                course_info["description"] = data["course"].get("description", "")
+                course_info["difficulty"] = data["course"].get("difficulty_level", "")
+                course_info["duration"] = data["course"].get("estimated_duration", "")
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            pass
+    
+    # Check if generation is complete by looking for progress_final.json
+    course_info["complete"] = "progress_final.json" in names
+    
+    # A course is in progress if it has an outline but not complete, OR if it has a progress file
+    course_info["in_progress"] = (has_outline and not course_info["complete"]) or has_progress_file
+    
+    # If we only have a progress file but no outline yet, try to get title from progress.json
+    if has_progress_file and not has_outline:
+        try:
+            with open(os.path.join(item_path, "progress.json"), 'rb') as f:
+                progress_data = orjson.loads(f.read())
+                if "summary" in progress_data and "course_title" in progress_data["summary"]:
+                    course_info["title"] = progress_data["summary"]["course_title"]
+                    course_info["initializing"] = True
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            pass
+    
+    course_info["folder"] = item
+    return course_info
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def scan_course_folders(output_dir, folder_mtimes):
+    """
+    Read the course info for each course folder
+    
+    Results are cached on the folder names and mtimes, so reruns that find the
+    output directory unchanged skip re-reading every course.
+    """
+    # Course folders are read in parallel so their file I/O overlaps
+    executor = get_course_scan_executor()
+    course_infos = executor.map(lambda item: read_course_info(output_dir, item), (item for item, _ in folder_mtimes))
+    courses = [course_info for course_info in course_infos if course_info is not None]
+    
+    # Sort courses by timestamp (newest first), with undated folders ahead of them
+    courses.sort(key=lambda x: x["timestamp"] or datetime.max, reverse=True)
+    return courses
 
 
 class CourseViewer:
@@ -231,152 +447,38 @@ class CourseViewer:
         """Initialize the course viewer with the output directory"""
         self.output_dir = output_dir
         self.courses = self._scan_courses()
+        self.courses_by_folder = {course["folder"]: course for course in self.courses}
         
     def _scan_courses(self):
         """Scan the output directory for course folders"""
-        courses = []
-        
-        if not os.path.exists(self.output_dir):
-            return courses
-            
-        for item in os.listdir(self.output_dir):
-            item_path = os.path.join(self.output_dir, item)
-            if os.path.isdir(item_path):
-                # Extract timestamp from folder name
-                timestamp_match = re.search(r'(\d{8}-\d{6})', item)
-                timestamp = None
-                if timestamp_match:
-                    timestamp_str = timestamp_match.group(1)
-                    try:
-                        timestamp = datetime.strptime(timestamp_str, "%Y%m%d-%H%M%S")
-                    except ValueError:
-                        pass
-                
-                # Initialize default course info
-                course_info = {"title": item, "description": "", "timestamp": timestamp}
-                
-                # Try to read course information from course_outline.json
-                outline_path = os.path.join(item_path, "course_outline.json")
-                if os.path.exists(outline_path):
-                    try:
-                        with open(outline_path, 'r') as f:
-                            data = json.load(f)
-                            if "course" in data:
-                                course_info["title"] = data["course"].get("title", item)
-                                course_info["description"] = data["course"].get("description", "")
-                                course_info["difficulty"] = data["course"].get("difficulty_level", "")
-                                course_info["duration"] = data["course"].get("estimated_duration", "")
-                    except json.JSONDecodeError:
-                        pass
-                
-                # Check if generation is complete by looking for progress_final.json
-                progress_final_path = os.path.join(item_path, "progress_final.json")
-                course_info["complete"] = os.path.exists(progress_final_path)
-                
-                # Check for progress.json for courses that are still initializing
-                progress_path = os.path.join(item_path, "progress.json")
-                has_progress_file = os.path.exists(progress_path)
-                
-                # A course is in progress if it has an outline but not complete, OR if it has a progress file
-                course_info["in_progress"] = (os.path.exists(outline_path) and not course_info["complete"]) or has_progress_file
-                
-                # If we only have a progress file but no outline yet, try to get title from progress.json
-                if has_progress_file and not os.path.exists(outline_path):
-                    try:
-                        with open(progress_path, 'r') as f:
-                            progress_data = json.load(f)
-                            if "summary" in progress_data and "course_title" in progress_data["summary"]:
-                                course_info["title"] = progress_data["summary"]["course_title"]
-                                course_info["initializing"] = True
-                    except json.JSONDecodeError:
-                        pass
-                
-                course_info["folder"] = item
-                courses.append(course_info)
-                
-        # Sort courses by timestamp (newest first) if available
-        courses.sort(key=lambda x: (x["timestamp"] is None, x["timestamp"] if x["timestamp"] else datetime.max), reverse=True)
-        return courses
+        try:
+            with os.scandir(self.output_dir) as entries:
+                # Dot-folders such as the pipeline's .cache are not courses. A folder's
+                # mtime changes whenever files are added to it, e.g. progress_final.json
+                folder_mtimes = tuple(sorted(
+                    (entry.name, entry.stat().st_mtime_ns)
+                    for entry in entries
+                    if not entry.name.startswith(".") and entry.is_dir()
+                ))
+        except FileNotFoundError:
+            return []
+        
+        return scan_course_folders(self.output_dir, folder_mtimes)
         
     def _get_units(self, course_folder):
         """Get all units in a course folder"""
-        units = []
         folder_path = os.path.join(self.output_dir, course_folder)
-        
-        for item in os.listdir(folder_path):
-            item_path = os.path.join(folder_path, item)
-            if os.path.isdir(item_path) and item.startswith("unit"):
-                # Extract unit number from folder name
-                unit_match = re.search(r'unit(\d+)', item)
-                if unit_match:
-                    unit_number = int(unit_match.group(1))
-                    unit_title = item[len(f"unit{unit_number}-"):].replace("_", " ")
-                    units.append({
-                        "number": unit_number,
-                        "title": unit_title,
-                        "folder": item
-                    })
-        
-        # Sort units by number
-        units.sort(key=lambda x: x["number"])
-        return units
+        return list_course_units(folder_path, os.stat(folder_path).st_mtime_ns)
         
     def _get_subunits(self, course_folder, unit_folder):
         """Get all subunits in a unit folder"""
-        subunits = []
         folder_path = os.path.join(self.output_dir, course_folder, unit_folder)
-        
-        for item in os.listdir(folder_path):
-            item_path = os.path.join(folder_path, item)
-            if os.path.isfile(item_path) and item.startswith("subunit") and item.endswith(".md"):
-                # Extract subunit information from frontmatter
-                with open(item_path, 'r') as f:
-                    content = f.read()
-                    
-                # Parse frontmatter
-                subunit_info = {"title": item, "number": 0}
-                frontmatter_match = re.match(r'^---\n(.*?)\n---\n(.*)', content, re.DOTALL)
-                if frontmatter_match:
-                    frontmatter_text = frontmatter_match.group(1)
-                    main_content = frontmatter_match.group(2)
-                    try:
-                        frontmatter = yaml.safe_load(frontmatter_text)
-                        subunit_info["title"] = frontmatter.get("title", item)
-                        subunit_info["number"] = float(frontmatter.get("subunit_number", 0))
-                    except (yaml.YAMLError, ValueError):
-                        # If parsing fails, extract subunit number from filename
-                        subunit_match = re.search(r'subunit(\d+\.\d+)', item)
-                        if subunit_match:
-                            subunit_info["number"] = float(subunit_match.group(1))
-                
-                subunit_info["file"] = item
-                subunits.append(subunit_info)
-        
-        # Sort subunits by number
-        subunits.sort(key=lambda x: x["number"])
-        return subunits
+        return list_unit_subunits(folder_path, os.stat(folder_path).st_mtime_ns)
         
     def _read_subunit_content(self, course_folder, unit_folder, subunit_file):
         """Read the content of a subunit file and extract frontmatter"""
         file_path = os.path.join(self.output_dir, course_folder, unit_folder, subunit_file)
-        
-        with open(file_path, 'r') as f:
-            content = f.read()
-            
-        # Parse frontmatter and content
-        frontmatter = {}
-        main_content = content
-        
-        frontmatter_match = re.match(r'^---\n(.*?)\n---\n(.*)', content, re.DOTALL)
-        if frontmatter_match:
-            frontmatter_text = frontmatter_match.group(1)
-            main_content = frontmatter_match.group(2)
-            try:
-                frontmatter = yaml.safe_load(frontmatter_text)
-            except yaml.YAMLError:
-                pass
-                
-        return frontmatter, main_content
+        return read_subunit_file(file_path, os.stat(file_path).st_mtime_ns)
     
     def render_course_list(self):
         """Render the list of available courses"""
@@ -435,13 +537,9 @@ class CourseViewer:
     def render_unit_list(self, course_folder):
         """Render the list of units for a course"""
         # Get course title
-        course_title = course_folder
-        course_complete = True
-        for course in self.courses:
-            if course["folder"] == course_folder:
-                course_title = course["title"]
-                course_complete = course.get("complete", True)
-                break
+        course = self.courses_by_folder.get(course_folder, {})
+        course_title = course.get("title", course_folder)
+        course_complete = course.get("complete", True)
         
         st.title(f"Course: {course_title}")
         
@@ -470,18 +568,23 @@ class CourseViewer:
         for unit in units:
             if st.button(f"Unit {unit['number']}: {unit['title']}", key=f"unit_{unit['number']}", use_container_width=True):
                 st.session_state.selected_unit = unit["folder"]
+                # Remember the unit's display title so the subunit list needn't look it up
+                st.session_state.selected_unit_title = (unit["folder"], f"Unit {unit['number']}: {unit['title']}")
                 st.session_state.selected_subunit = None
                 st.rerun()
         
     def render_subunit_list(self, course_folder, unit_folder):
         """Render the list of subunits for a unit"""
-        # Get unit title
-        unit_title = unit_folder
-        units = self._get_units(course_folder)
-        for unit in units:
-            if unit["folder"] == unit_folder:
-                unit_title = f"Unit {unit['number']}: {unit['title']}"
-                break
+        # Get unit title, from the unit list click if it was for this unit
+        selected_unit_title = st.session_state.get("selected_unit_title")
+        if selected_unit_title and selected_unit_title[0] == unit_folder:
+            unit_title = selected_unit_title[1]
+        else:
+            unit_title = unit_folder
+            for unit in self._get_units(course_folder):
+                if unit["folder"] == unit_folder:
+                    unit_title = f"Unit {unit['number']}: {unit['title']}"
+                    break
         
         st.title(unit_title)
         